@@ -0,0 +1,211 @@
+from collections import OrderedDict
+from collections.abc import Iterable
+from typing import NamedTuple
+
+import numpy as np
+
+from curs.db import CursDB
+from curs.types import Date, Series, SeriesMatrix, _DateT, series_matrix, to_date
+
+__all__ = ("SeriesCache", "CacheStats")
+
+_EPOCH_ORDINAL = Date(1970, 1, 1).toordinal()
+
+
+class CacheStats(NamedTuple):
+    hits: int
+    misses: int
+    queries: int
+    evictions: int
+    invalidations: int
+    nbytes: int
+
+
+class _Entry:
+    __slots__ = ("intervals", "dates", "values")
+
+    def __init__(self):
+        # disjoint, sorted, inclusive [first, last] epoch days already read
+        self.intervals: list[tuple[int, int]] = []
+        self.dates = np.array([], dtype="datetime64[D]")
+        self.values = np.array([], dtype=np.float64)
+
+    @property
+    def nbytes(self) -> int:
+        return self.dates.nbytes + self.values.nbytes + 16 * len(self.intervals)
+
+    def missing(self, first: int, last: int) -> list[tuple[int, int]]:
+        gaps = []
+        for start, end in self.intervals:
+            if end < first:
+                continue
+            if start > last:
+                break
+            if start > first:
+                gaps.append((first, start - 1))
+            first = max(first, end + 1)
+            if first > last:
+                return gaps
+        gaps.append((first, last))
+        return gaps
+
+    def merge(self, first: int, last: int, series: Series | None) -> None:
+        intervals = sorted(self.intervals + [(first, last)])
+        merged = [intervals[0]]
+        for start, end in intervals[1:]:
+            if start <= merged[-1][1] + 1:
+                merged[-1] = merged[-1][0], max(merged[-1][1], end)
+            else:
+                merged.append((start, end))
+        self.intervals = merged
+
+        if series is not None and len(series.dates):
+            # the gap was never read before, so there is nothing to dedupe
+            at = np.searchsorted(self.dates, series.dates[0])
+            self.dates = np.concatenate(
+                (self.dates[:at], series.dates, self.dates[at:])
+            )
+            self.values = np.concatenate(
+                (self.values[:at], series.values, self.values[at:])
+            )
+
+    def slice(self, first: int, last: int) -> Series:
+        lo = np.searchsorted(self.dates, np.datetime64(first, "D"), side="left")
+        hi = np.searchsorted(self.dates, np.datetime64(last, "D"), side="right")
+        return Series(self.dates[lo:hi], self.values[lo:hi])
+
+
+class SeriesCache:
+    def __init__(self, db: CursDB, *, max_bytes: int = 64 * 2**20):
+        if max_bytes <= 0:
+            raise ValueError(f"invalid max_bytes {max_bytes!r}")
+        self._db = db
+        self._max_bytes = max_bytes
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._date_range: tuple[Date | None, Date | None] | None = None
+        self._currencies: list[str] | None = None
+        self._version = self._db_version()
+        self._hits = self._misses = self._queries = 0
+        self._evictions = self._invalidations = 0
+
+    @property
+    def stats(self) -> CacheStats:
+        return CacheStats(
+            self._hits,
+            self._misses,
+            self._queries,
+            self._evictions,
+            self._invalidations,
+            self.nbytes,
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return sum(entry.nbytes for entry in self._entries.values())
+
+    @property
+    def currencies(self) -> list[str]:
+        return list(self._entries.keys())
+
+    def invalidate(self) -> None:
+        self._entries.clear()
+        self._date_range = None
+        self._currencies = None
+        self._invalidations += 1
+
+    def get_date_range(self) -> tuple[Date | None, Date | None]:
+        self._check_version()
+        if self._date_range is None:
+            self._date_range = self._db.get_date_range()
+        return self._date_range
+
+    def get_currencies(self) -> list[str]:
+        self._check_version()
+        if self._currencies is None:
+            self._currencies = self._db.get_currencies()
+        return self._currencies
+
+    def series(
+        self, currency: str, date: tuple[_DateT | None, _DateT | None]
+    ) -> Series:
+        return self.select_series([currency], date)[currency]
+
+    def select_matrix(
+        self,
+        currencies: Iterable[str] | None = None,
+        date: tuple[_DateT | None, _DateT | None] = (None, None),
+    ) -> SeriesMatrix:
+        if currencies is None:
+            currencies = self.get_currencies()
+        series = self.select_series(currencies, date)
+        return series_matrix({k: v for k, v in series.items() if len(v.dates)})
+
+    def select_series(
+        self,
+        currencies: Iterable[str],
+        date: tuple[_DateT | None, _DateT | None],
+    ) -> dict[str, Series]:
+        # open ends stand for the first/last date in the database
+        self._check_version()
+        date = tuple(
+            limit if d is None else d for d, limit in zip(date, self.get_date_range())
+        )
+        if None in date:
+            return {currency: _Entry().slice(0, 0) for currency in currencies}
+
+        first, last = (to_date(d).toordinal() - _EPOCH_ORDINAL for d in date)
+        if last < first:
+            raise ValueError(f"invalid date range {date[0]!s} .. {date[1]!s}")
+        currencies = list(dict.fromkeys(currencies))
+
+        # currencies missing the same edge are read with one query
+        gaps: dict[tuple[int, int], list[str]] = {}
+        for currency in currencies:
+            entry = self._entries.get(currency)
+            if entry is None:
+                entry = self._entries[currency] = _Entry()
+            self._entries.move_to_end(currency)
+            missing = entry.missing(first, last)
+            if missing:
+                self._misses += 1
+            else:
+                self._hits += 1
+            for gap in missing:
+                gaps.setdefault(gap, []).append(currency)
+
+        for (start, end), names in gaps.items():
+            fetched = self._db.select_series(
+                names,
+                date=(
+                    Date.fromordinal(start + _EPOCH_ORDINAL),
+                    Date.fromordinal(end + _EPOCH_ORDINAL),
+                ),
+            )
+            self._queries += 1
+            for name in names:
+                self._entries[name].merge(start, end, fetched.get(name))
+
+        result = {
+            currency: self._entries[currency].slice(first, last)
+            for currency in currencies
+        }
+        self._evict(keep=len(currencies))
+        return result
+
+    def _evict(self, *, keep: int) -> None:
+        # least recently used first, but never what was just asked for
+        nbytes = self.nbytes
+        while nbytes > self._max_bytes and len(self._entries) > keep:
+            _, entry = self._entries.popitem(last=False)
+            nbytes -= entry.nbytes
+            self._evictions += 1
+
+    def _db_version(self) -> tuple[int, int]:
+        # data_version covers other connections, total_changes our own
+        return self._db.data_version, self._db.total_changes
+
+    def _check_version(self) -> None:
+        version = self._db_version()
+        if version != self._version:
+            self._version = version
+            self.invalidate()
@@ -2,19 +2,44 @@ import datetime as dt
 from pathlib import Path
 from typing import List, Tuple
 
+from curs.http import ConnectionPool, PoolStats  # noqa: F401
+from curs.soap import SoapTransport
 from curs.types import Date, Numeric, _DateT, to_date, to_datetime, to_numeric
 from suds.client import Client as _suds_Client
 
 
 class CursClient:
-    def __init__(self, use_local_wsdl: bool = False):
-        url = "http://www.infovalutar.ro/curs.asmx?wsdl"
+    URL = "http://www.infovalutar.ro/curs.asmx"
+
+    def __init__(
+        self,
+        use_local_wsdl: bool = False,
+        *,
+        lightweight: bool = False,
+        url: str | None = None,
+        pool: ConnectionPool | None = None,
+    ):
+        if lightweight:
+            self._client = None
+            self._soap = SoapTransport(url if url is not None else self.URL, pool=pool)
+            return
+
+        wsdl_url = self.URL + "?wsdl"
         if use_local_wsdl:
-            url = (Path(__file__).resolve().parent / "curs.wsdl").as_uri()
-        self._client = _suds_Client(url)
+            wsdl_url = (Path(__file__).resolve().parent / "curs.wsdl").as_uri()
+        options = {"location": url} if url is not None else {}
+        self._client = _suds_Client(wsdl_url, **options)
+        self._soap = None
+
+    @property
+    def pool_stats(self) -> PoolStats | None:
+        if self._soap is not None:
+            return self._soap.pool.stats
 
     @property
     def lastdate(self) -> dt.date:
+        if self._soap is not None:
+            return self._soap.lastdateinserted().date()
         return self._client.service.lastdateinserted().date()
 
     def get_all(self, date: _DateT | None = None) -> List[Tuple[str, Numeric]]:
@@ -22,6 +47,12 @@ class CursClient:
             date = self.lastdate
         date = to_datetime(date)
 
+        if self._soap is not None:
+            return [
+                (currency, to_numeric(value))
+                for currency, value in self._soap.getall(date)
+            ]
+
         level0 = self._client.service.getall(date).diffgram
         level1 = level0[0] if level0 else []
         level2 = level1[0] if level1 else []
@@ -34,8 +65,21 @@ class CursClient:
         ]
 
     def value(self, date: _DateT, currency: str) -> Numeric | None:
+        if self._soap is not None:
+            return to_numeric(self._soap.getvalue(to_datetime(date), currency))
         return self._client.service.getvalue(date, currency)
 
+    def latest_value(self, currency: str) -> Numeric:
+        if self._soap is not None:
+            return to_numeric(self._soap.getlatestvalue(currency))
+        return to_numeric(self._client.service.getlatestvalue(currency))
+
     def get_value(self, date: _DateT, currency: str) -> Tuple[Date, str, Numeric]:
+        if self._soap is not None:
+            r_date, r_currency, r_value = self._soap.getvalueadv(
+                to_datetime(date), currency
+            )
+            return to_date(r_date), r_currency, to_numeric(r_value)
+
         result = self._client.service.getvalueadv(to_datetime(date), currency)
         return to_date(result.date), result.moneda, to_numeric(result.value)
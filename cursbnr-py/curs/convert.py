@@ -0,0 +1,127 @@
+from collections.abc import Iterable, Mapping
+
+import numpy as np
+
+from curs.cache import SeriesCache
+from curs.db import CursDB
+from curs.types import Date, Series, SeriesMatrix, _DateT, to_date
+
+__all__ = ("CrossRates", "RON", "UNITS")
+
+RON = "RON"
+
+# BNR quotes these per 100 units; everything else per 1 unit
+UNITS: Mapping[str, int] = {"HUF": 100, "IDR": 100, "ISK": 100, "JPY": 100, "KRW": 100}
+
+
+def _forward_fill(values: np.ndarray) -> np.ndarray:
+    # each NaN takes the last value above it in the same column
+    rows = np.where(np.isnan(values), 0, np.arange(len(values))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return values[rows, np.arange(values.shape[1])]
+
+
+class CrossRates:
+    def __init__(self, matrix: SeriesMatrix, *, units: Mapping[str, int] = UNITS):
+        if RON in matrix.currencies:
+            raise ValueError(f"{RON} is the base currency, not a column")
+
+        per_unit = _forward_fill(matrix.values) / np.array(
+            [units.get(currency, 1) for currency in matrix.currencies]
+        )
+        self._dates = matrix.dates
+        self._currencies = [RON, *matrix.currencies]
+        self._codes = {currency: k for k, currency in enumerate(self._currencies)}
+        # RON per one unit of each currency, forward-filled, RON itself first
+        self._ron = np.hstack((np.ones((len(per_unit), 1)), per_unit))
+
+    @classmethod
+    def load(
+        cls,
+        source: CursDB | SeriesCache,
+        currencies: Iterable[str] | None = None,
+        date: tuple[_DateT | None, _DateT | None] | None = None,
+        *,
+        units: Mapping[str, int] = UNITS,
+    ) -> "CrossRates":
+        first, last = date if date is not None else (None, None)
+        if currencies is not None:
+            currencies = [currency for currency in currencies if currency != RON]
+
+        # read from the start, so that the first days can be filled forward too
+        rates = cls(source.select_matrix(currencies, (None, last)), units=units)
+        if first is not None:
+            rates._trim(np.datetime64(to_date(first), "D"))
+        return rates
+
+    @property
+    def dates(self) -> np.ndarray:
+        return self._dates
+
+    @property
+    def currencies(self) -> list[str]:
+        return list(self._currencies)
+
+    def ron(self, currency: str) -> Series:
+        return Series(self._dates, self._ron[:, self._code(currency)])
+
+    def cross(self, base: str, quote: str) -> Series:
+        # units of `quote` for one unit of `base`
+        ron = self._ron
+        return Series(self._dates, ron[:, self._code(base)] / ron[:, self._code(quote)])
+
+    def table(self, date: _DateT | None = None) -> np.ndarray:
+        # [date, base, quote] over all dates, or [base, quote] for one date
+        ron = self._ron
+        if date is not None:
+            (row,) = self._rows([to_date(date)])
+            ron = ron[row] if row >= 0 else np.full(ron.shape[1], np.nan)
+        return ron[..., :, None] / ron[..., None, :]
+
+    def convert(
+        self,
+        amounts: Iterable[float] | np.ndarray | float,
+        from_ccy: str | Iterable[str],
+        to_ccy: str | Iterable[str],
+        dates: _DateT | Iterable[_DateT] | np.ndarray,
+    ) -> np.ndarray:
+        # as-of the latest rates on or before each date, NaN before the first
+        if isinstance(dates, (str, Date)):
+            dates = [dates]
+        amounts = np.asarray(amounts, dtype=np.float64)
+        rows = self._rows(dates)
+        from_cols = self._codes_of(from_ccy)
+        to_cols = self._codes_of(to_ccy)
+        amounts, rows, from_cols, to_cols = np.broadcast_arrays(
+            amounts, rows, from_cols, to_cols
+        )
+
+        valid = rows >= 0
+        rows = np.where(valid, rows, 0)
+        ron = self._ron
+        result = amounts * ron[rows, from_cols] / ron[rows, to_cols]
+        result[~valid] = np.nan
+        return result
+
+    def _code(self, currency: str) -> int:
+        try:
+            return self._codes[currency]
+        except KeyError:
+            raise ValueError(f"unknown currency {currency!r}") from None
+
+    def _codes_of(self, currencies: str | Iterable[str]) -> np.ndarray:
+        if isinstance(currencies, str):
+            return np.intp(self._code(currencies))
+        return np.fromiter(map(self._code, currencies), dtype=np.intp)
+
+    def _rows(self, dates: Iterable[_DateT] | np.ndarray) -> np.ndarray:
+        if not isinstance(dates, np.ndarray):
+            dates = [to_date(date) for date in dates]
+        days = np.asarray(dates, dtype="datetime64[D]")
+        return np.searchsorted(self._dates, days, side="right") - 1
+
+    def _trim(self, first: np.datetime64) -> None:
+        # keep the last row before `first`, it is still in effect on `first`
+        start = max(np.searchsorted(self._dates, first, side="right") - 1, 0)
+        self._dates = self._dates[start:]
+        self._ron = self._ron[start:]
@@ -1,20 +1,38 @@
+import datetime as dt
 import re
 import sqlite3
-from itertools import starmap
+from itertools import chain, groupby, starmap
+from operator import itemgetter
 from pathlib import Path
-from typing import Any, Callable, Iterable, Literal, NamedTuple, Type, TypeVar
+from typing import (
+    Any,
+    Callable,
+    Iterable,
+    Iterator,
+    Literal,
+    NamedTuple,
+    Type,
+    TypeVar,
+)
 
 from textwrap import dedent
 
+import numpy as np
+
 from curs.types import (
+    CurrencyStats,
     Date,
     Numeric,
+    Ohlc,
     DateCurrencyRow,
     DateCurrencyValueRow,
     DateCurrencyOptValueRow,
+    Series,
+    SeriesMatrix,
     _DateT,
     _NumT,
     require_str,
+    series_matrix,
     to_date,
     to_date_opt,
     to_numeric_opt,
@@ -28,9 +46,50 @@ _OptOrNoValueRowT = _OptValueRowT | _NoValueRowT
 _T = TypeVar("_T")
 _NamedTuple_T = TypeVar("_NamedTuple_T", bound=NamedTuple)
 
+# days since 1970-01-01, as in numpy's datetime64[D]
+_SQL_EPOCH_DAY = "CAST(julianday(date) - 2440587.5 AS INTEGER)"
+
+# first day of the period a date falls in; weeks start on Monday
+_SQL_PERIOD = {
+    "week": "date(date, '-' || ((strftime('%w', date) + 6) % 7) || ' days')",
+    "month": "date(date, 'start of month')",
+    "year": "date(date, 'start of year')",
+}
+_SQL_INSERT_ROLLUP = """
+    INSERT OR REPLACE INTO CURSBNR_ROLLUP
+        (level, currency, period, open, high, low, close, mean, count)
+    """
+# rough number of rows per period, for picking a level under a point budget
+_PERIOD_DAYS = {"day": 1, "week": 7, "month": 30.44, "year": 365.25}
+
+
+def _period_start(level: str, date: Date) -> Date:
+    match level:
+        case "week":
+            return date - dt.timedelta(days=date.weekday())
+        case "month":
+            return date.replace(day=1)
+        case "year":
+            return date.replace(month=1, day=1)
+    raise ValueError(f"invalid rollup level {level!r}")
+
+
+def _period_end(level: str, date: Date) -> Date:
+    match level:
+        case "week":
+            return date + dt.timedelta(days=6 - date.weekday())
+        case "month":
+            next_month = date.replace(day=28) + dt.timedelta(days=4)
+            return next_month - dt.timedelta(days=next_month.day)
+        case "year":
+            return date.replace(month=12, day=31)
+    raise ValueError(f"invalid rollup level {level!r}")
+
 
 class CursDB:
     DB_MODES = "ro", "rw", "rwc"
+    SCHEMA_VERSION = 3
+    ROLLUP_LEVELS = "week", "month", "year"
 
     def __init__(
         self,
@@ -67,10 +126,24 @@ class CursDB:
             if self._has_table("CURSBNR_NO_VALUE"):
                 self._merge_no_value_table()
 
+            # so that INSERT OR REPLACE runs the delete triggers too
+            self._exec("PRAGMA recursive_triggers = ON")
+            self._upgrade_schema()
+
+        self._schema_version = self._exec_fetchone("PRAGMA user_version")[0]
+
     @property
     def connection(self) -> sqlite3.Connection:
         return self._conn
 
+    @property
+    def read_only(self) -> bool:
+        return self._read_only
+
+    @property
+    def schema_version(self) -> int:
+        return self._schema_version
+
     @property
     def in_transaction(self):
         return self._conn.in_transaction
@@ -82,17 +155,95 @@ class CursDB:
         self._conn.close()
 
     def commit(self):
+        self._update_rollups()
         self._conn.commit()
 
     def rollback(self):
         self._conn.rollback()
 
     def get_currencies(self) -> list[str]:
+        if self._schema_version >= 1:
+            return self._exec_fetch_column(
+                "SELECT currency FROM CURSBNR_CURRENCIES ORDER BY currency", value=str
+            )
         return self._exec_fetch_column(
             "SELECT currency FROM CURSBNR GROUP BY currency", value=str
         )
 
+    def get_currency_stats(
+        self, currency: str | list[str] | None = None
+    ) -> list[CurrencyStats]:
+        if self._schema_version < 1:
+            sql, params = self._sql_where(
+                "SELECT currency, MIN(date) FILTER (WHERE value IS NOT NULL),"
+                " MAX(date) FILTER (WHERE value IS NOT NULL), COUNT(*), COUNT(value)"
+                " FROM CURSBNR",
+                currency=currency,
+                value_is_null=None,
+            )
+            sql += "\nGROUP BY currency"
+        else:
+            sql, params = self._sql_where(
+                "SELECT currency, first_date, last_date, row_count, value_count"
+                " FROM CURSBNR_CURRENCIES",
+                currency=currency,
+                value_is_null=None,
+            )
+        sql += self._sql_order_by("currency")
+
+        return self._exec_fetchall_apply(
+            sql,
+            params,
+            func=lambda row: CurrencyStats(
+                row[0], to_date_opt(row[1]), to_date_opt(row[2]), row[3], row[4]
+            ),
+        )
+
+    def get_dates(
+        self,
+        *,
+        date: _DateT | tuple[_DateT, _DateT] | None = None,
+        has_values: bool | None = None,
+    ) -> list[Date]:
+        sql, params = self._sql_where(
+            "SELECT date FROM CURSBNR",
+            date=date,
+            value_is_null=None,
+        )
+
+        sql += "\nGROUP BY date"
+        if has_values is not None:
+            sql += "\nHAVING COUNT(value) " + {True: "> 0", False: "= 0"}[has_values]
+        sql += self._sql_order_by("date")
+
+        return self._exec_fetch_column(sql, params, value=to_date)
+
+    def refresh_currency_stats(self):
+        self._exec("DELETE FROM CURSBNR_CURRENCIES")
+        self._exec(
+            """
+            INSERT INTO CURSBNR_CURRENCIES
+                (currency, first_date, last_date, row_count, value_count)
+            SELECT
+                currency,
+                MIN(date) FILTER (WHERE value IS NOT NULL),
+                MAX(date) FILTER (WHERE value IS NOT NULL),
+                COUNT(*),
+                COUNT(value)
+            FROM CURSBNR
+            GROUP BY currency
+            """
+        )
+
     def get_date_range(self, currency=None) -> tuple[Date | None, Date | None]:
+        if self._schema_version >= 1:
+            sql, params = self._sql_where(
+                "SELECT MIN(first_date), MAX(last_date) FROM CURSBNR_CURRENCIES",
+                currency=currency,
+                value_is_null=None,
+            )
+            mind, maxd = self._exec_fetchone(sql, params)
+            return to_date_opt(mind), to_date_opt(maxd)
 
         sql, params = self._sql_where(
             "SELECT MIN(date), MAX(date) FROM CURSBNR",
@@ -119,7 +270,7 @@ class CursDB:
 
     def insert_many_values(
         self, rows: Iterable[_OptValueRowT], *, replace: bool | None = None
-    ) -> None:
+    ) -> int:
         value_rows = (
             (to_date(date), require_str(currency), to_numeric_opt(value))
             for date, currency, value in rows
@@ -133,7 +284,7 @@ class CursDB:
 
     def delete_many_values(
         self, rows: Iterable[_OptOrNoValueRowT], *, are_you_sure: bool
-    ) -> None:
+    ) -> int | None:
         if not are_you_sure:  # <(°.°)>
             return
 
@@ -181,14 +332,61 @@ class CursDB:
         require_str(currency)
         result = self._exec_fetchone(
             """
-            SELECT date, currency, value FROM CURSBNR WHERE date<=? AND currency=? 
+            SELECT date, currency, value FROM CURSBNR WHERE date<=? AND currency=?
             ORDER BY date DESC
+            LIMIT 1
             """,
             [date, currency],
         )
         if result is not None:
             return DateCurrencyValueRow(*result)
 
+    def values_asof(
+        self,
+        dates: Iterable[_DateT] | np.ndarray,
+        currency: str | Iterable[str],
+    ) -> Series:
+        # latest valid rate on or before each date, NaT/NaN where there is none;
+        # `currency` is either one name or one name per date
+        if not isinstance(dates, np.ndarray):
+            dates = [to_date(date) for date in dates]
+        days = np.asarray(dates, dtype="datetime64[D]")
+        if isinstance(currency, str):
+            codes = {require_str(currency): 0}
+            order = None
+        else:
+            codes = {}
+            which = np.fromiter(
+                (codes.setdefault(name, len(codes)) for name in currency),
+                dtype=np.intp,
+            )
+            if which.shape != days.shape:
+                raise ValueError(f"got {len(which)} currencies for {len(days)} dates")
+            # dates of the same currency side by side, then one search each
+            order = np.argsort(which, kind="stable")
+            bounds = np.searchsorted(which[order], np.arange(len(codes) + 1))
+        names = list(map(require_str, codes))
+
+        eff_dates = np.full(days.shape, np.datetime64("NaT"), dtype="datetime64[D]")
+        values = np.full(days.shape, np.nan)
+        if not len(days):
+            return Series(eff_dates, values)
+
+        last = days.max().astype(object)
+        series = self.select_series(names, date=(None, last))
+        for k, name in enumerate(names):
+            found = series.get(name)
+            if found is None or not len(found.dates):
+                continue
+            at = slice(None) if order is None else order[bounds[k] : bounds[k + 1]]
+            idx = np.searchsorted(found.dates, days[at], side="right") - 1
+            valid = idx >= 0
+            idx[~valid] = 0
+            eff_dates[at] = np.where(valid, found.dates[idx], np.datetime64("NaT"))
+            values[at] = np.where(valid, found.values[idx], np.nan)
+
+        return Series(eff_dates, values)
+
     def remove_rows(
         self,
         date: _DateT | tuple[_DateT, _DateT] | None = None,
@@ -217,6 +415,102 @@ class CursDB:
         )
         self._exec_many(sql, param_rows)
 
+    def select_rollup(
+        self,
+        currency: str | list[str] | None = None,
+        date: _DateT | tuple[_DateT, _DateT] | None = None,
+        *,
+        level: Literal["day", "week", "month", "year"],
+    ) -> dict[str, Ohlc]:
+        # periods starting within `date`; "day" reads the daily values as is
+        if level == "day":
+            sql, params = (
+                "SELECT currency, date, value AS open, value AS high, value AS low,"
+                " value AS close, value AS mean, 1 AS count"
+                " FROM CURSBNR WHERE value IS NOT NULL",
+                [],
+            )
+        elif level not in self.ROLLUP_LEVELS:
+            raise ValueError(f"invalid rollup level {level!r}")
+        elif self._schema_version >= 2:
+            sql, params = (
+                "SELECT currency, period AS date, open, high, low, close, mean, count"
+                " FROM CURSBNR_ROLLUP WHERE level = ?",
+                [level],
+            )
+            # periods written to since the last commit() are aggregated
+            # afresh, the stored ones may be stale
+            fresh = []
+            for name, (first, last) in self._stale_rollups().items():
+                span = _period_start(level, first), _period_end(level, last)
+                sql += " AND NOT (currency = ? AND period BETWEEN ? AND ?)"
+                params += [name, *span]
+                fresh.append(self._sql_rollup(level, currency=name, date=span))
+            for fresh_sql, fresh_params in fresh:
+                sql += (
+                    "\nUNION ALL SELECT currency, period AS date,"
+                    f" open, high, low, close, mean, count FROM ({fresh_sql})"
+                )
+                params += fresh_params
+        else:
+            # not upgraded (opened read-only): aggregate on the fly
+            sql, params = self._sql_rollup(level)
+            sql = (
+                "SELECT currency, period AS date, open, high, low, close, mean, count"
+                f" FROM ({sql})"
+            )
+
+        sql, params = self._sql_where(
+            f"SELECT * FROM ({sql})",
+            params,
+            date=date,
+            currency=currency,
+            value_is_null=None,
+        )
+        sql += self._sql_order_by("currency,date")
+
+        rows = self._exec_fetchall_apply(sql, params, func=tuple)
+
+        result = {}
+        for name, group in groupby(rows, key=itemgetter(0)):
+            columns = list(zip(*group))[1:]
+            result[name] = Ohlc(
+                np.array(columns[0], dtype="datetime64[D]"),
+                *(np.array(column, dtype=np.float64) for column in columns[1:6]),
+                np.array(columns[6], dtype=np.int64),
+            )
+        return result
+
+    @staticmethod
+    def rollup_level(
+        date: tuple[_DateT, _DateT], max_points: int
+    ) -> Literal["day", "week", "month", "year"]:
+        # the finest level whose period count over `date` fits in `max_points`
+        first, last = map(to_date, date)
+        n_days = (last - first).days + 1
+        for level, period_days in _PERIOD_DAYS.items():
+            if n_days / period_days <= max_points:
+                return level
+        return "year"
+
+    def select_ohlc(
+        self,
+        currency: str | list[str] | None,
+        date: tuple[_DateT, _DateT],
+        *,
+        max_points: int,
+    ) -> tuple[str, dict[str, Ohlc]]:
+        level = self.rollup_level(date, max_points)
+        return level, self.select_rollup(currency, date, level=level)
+
+    def rebuild_rollups(self) -> None:
+        if self._has_table("CURSBNR_ROLLUP_DIRTY"):
+            self._exec("DELETE FROM CURSBNR_ROLLUP_DIRTY")
+        self._exec("DELETE FROM CURSBNR_ROLLUP")
+        for level in self.ROLLUP_LEVELS:
+            sql, params = self._sql_rollup(level)
+            self._exec(_SQL_INSERT_ROLLUP + sql, params)
+
     def select_rows(
         self,
         *,
@@ -241,6 +535,36 @@ class CursDB:
 
         return self._exec_fetchall_rows(sql, params, type=row_type)
 
+    def iter_currency_rows(
+        self,
+        currency: str | list[str] | None = None,
+        *,
+        iso_dates: bool = False,
+    ) -> Iterator[tuple[str, Iterator[tuple[Date | str, Numeric | None]]]]:
+        # (currency, its (date, value) rows by date) one currency at a time,
+        # each read from the cursor as it is consumed; iso_dates leaves the
+        # dates as the 'YYYY-MM-DD' text they are stored as
+        if currency is None:
+            currencies = self.get_currencies()
+        elif isinstance(currency, str):
+            currencies = [currency]
+        else:
+            currencies = sorted(currency)
+
+        sql = (
+            "SELECT "
+            + ("CAST(date AS TEXT)" if iso_dates else "date")
+            + ", value FROM CURSBNR WHERE currency = ?"
+            + self._sql_order_by("date")
+        )
+        for name in currencies:
+            # closed once the consumer moves on, or stops early
+            cursor = self._conn.execute(sql, [require_str(name)])
+            try:
+                yield name, cursor
+            finally:
+                cursor.close()
+
     def select_value_rows(
         self,
         *,
@@ -260,10 +584,76 @@ class CursDB:
 
         return self._exec_fetchall_rows(sql, params, type=DateCurrencyValueRow)
 
+    def select_series(
+        self,
+        currency: str | list[str] | None = None,
+        date: _DateT | tuple[_DateT, _DateT] | None = None,
+    ) -> dict[str, Series]:
+        # filled straight from the cursor, without per-row Python objects
+        if isinstance(currency, str):
+            currency = [currency]
+
+        owns_transaction = not self.in_transaction
+        if owns_transaction:
+            self.begin()  # both queries must see the same rows
+        try:
+            sql, params = self._sql_where(
+                "SELECT currency, COUNT(*) FROM CURSBNR",
+                date=date,
+                currency=currency,
+                value_is_null=False,
+            )
+            sql += "\nGROUP BY currency" + self._sql_order_by("currency")
+            counts = self._exec_fetchall_apply(sql, params, func=tuple)
+
+            sql, params = self._sql_where(
+                f"SELECT {_SQL_EPOCH_DAY}, value FROM CURSBNR",
+                date=date,
+                currency=currency,
+                value_is_null=False,
+            )
+            sql += self._sql_order_by("currency,date")
+            total = sum(count for _, count in counts)
+            cursor = self._conn.execute(dedent(sql), params)
+            try:
+                flat = np.fromiter(
+                    chain.from_iterable(cursor), dtype=np.float64, count=2 * total
+                )
+            finally:
+                cursor.close()
+        finally:
+            if owns_transaction:
+                self.commit()
+
+        pairs = flat.reshape(-1, 2)
+        days = pairs[:, 0].astype(np.int64).astype("datetime64[D]")
+        values = np.ascontiguousarray(pairs[:, 1])
+
+        series = {}
+        start = 0
+        for name, count in counts:
+            series[name] = Series(
+                days[start : start + count], values[start : start + count]
+            )
+            start += count
+        return series
+
+    def select_matrix(
+        self,
+        currency: str | list[str] | None = None,
+        date: _DateT | tuple[_DateT, _DateT] | None = None,
+    ) -> SeriesMatrix:
+        return series_matrix(self.select_series(currency, date))
+
     @property
     def total_changes(self) -> int:
         return self._exec_fetchone("SELECT total_changes();")[0]
 
+    @property
+    def data_version(self) -> int:
+        # changes whenever another connection commits to the database file
+        return self._exec_fetchone("PRAGMA data_version;")[0]
+
     def select_date_currency_rows(
         self,
         *,
@@ -281,6 +671,26 @@ class CursDB:
 
         return self._exec_fetchall_rows(sql, params, type=DateCurrencyRow)
 
+    def select_currency_ordinals(
+        self,
+        *,
+        date: _DateT | tuple[_DateT, _DateT] | None = None,
+        currency: str | list[str] | None = None,
+        value_is_null: bool = None,
+    ) -> list[tuple[str, int]]:
+        # proleptic Gregorian ordinals, as in `datetime.date.toordinal()`
+        sql, params = self._sql_where(
+            "SELECT currency, CAST(julianday(date) - 1721424.5 AS INTEGER)"
+            " FROM CURSBNR",
+            date=date,
+            currency=currency,
+            value_is_null=value_is_null,
+        )
+
+        sql += self._sql_order_by("currency")
+
+        return self._exec_fetchall_apply(sql, params, func=tuple)
+
     # ---------
 
     def _has_table(self, tablename: str):
@@ -304,6 +714,238 @@ class CursDB:
             """
         )
 
+    def _sql_rollup(
+        self,
+        level: str,
+        *,
+        currency: str | list[str] | None = None,
+        date: tuple[Date, Date] | None = None,
+    ) -> tuple[str, list]:
+        sql, params = self._sql_where(
+            f"""
+            SELECT
+                currency,
+                {_SQL_PERIOD[level]} AS period,
+                MIN(date) AS first,
+                MAX(date) AS last,
+                MAX(value) AS high,
+                MIN(value) AS low,
+                AVG(value) AS mean,
+                COUNT(value) AS count
+            FROM CURSBNR
+            """,
+            date=date,
+            currency=currency,
+            value_is_null=False,
+        )
+        sql += "\nGROUP BY currency, period"
+        sql = f"""
+            SELECT ? AS level, g.currency, g.period,
+                o.value AS open, g.high, g.low, c.value AS close, g.mean, g.count
+            FROM ({sql}) AS g
+            JOIN CURSBNR AS o ON o.currency = g.currency AND o.date = g.first
+            JOIN CURSBNR AS c ON c.currency = g.currency AND c.date = g.last
+            """
+        return sql, [level, *params]
+
+    def _stale_rollups(self) -> dict[str, tuple[Date, Date]]:
+        # currency -> (first, last) date written since the rollups were
+        # last updated, however it was written
+        if self._schema_version < 3:
+            return {}
+        return {
+            currency: (to_date(first), to_date(last))
+            for currency, first, last in self._exec_fetchall_apply(
+                "SELECT currency, first_date, last_date FROM CURSBNR_ROLLUP_DIRTY",
+                func=tuple,
+            )
+        }
+
+    def _update_rollups(self) -> None:
+        # recompute only the periods the rows written since the last commit
+        # fall in, whole periods so that open/close/mean stay right
+        stale = {} if self._read_only else self._stale_rollups()
+        if not stale:
+            return
+
+        for currency, (first, last) in stale.items():
+            for level in self.ROLLUP_LEVELS:
+                span = _period_start(level, first), _period_end(level, last)
+                self._exec(
+                    "DELETE FROM CURSBNR_ROLLUP"
+                    " WHERE level = ? AND currency = ? AND period BETWEEN ? AND ?",
+                    [level, currency, *span],
+                )
+                sql, params = self._sql_rollup(level, currency=currency, date=span)
+                self._exec(_SQL_INSERT_ROLLUP + sql, params)
+        self._exec("DELETE FROM CURSBNR_ROLLUP_DIRTY")
+
+    def _upgrade_schema(self):
+        version = self._exec_fetchone("PRAGMA user_version")[0]
+        if version > self.SCHEMA_VERSION:
+            raise ValueError(
+                f"database schema version {version} is newer than"
+                f" {self.SCHEMA_VERSION}"
+            )
+
+        if version < 1:
+            self._create_currency_index()
+            self._create_currency_table()
+
+        if version < 3:
+            self._create_rollup_triggers()
+
+        if version < 2:
+            self._create_rollup_table()
+        elif version < 3:
+            # writes that bypassed commit() may have left them stale
+            self.rebuild_rollups()
+
+        if version < self.SCHEMA_VERSION:
+            self._exec(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+            self._schema_version = self.SCHEMA_VERSION
+            self.commit()
+
+    def _create_rollup_table(self):
+        self._exec(
+            """
+            CREATE TABLE IF NOT EXISTS CURSBNR_ROLLUP(
+                level TEXT NOT NULL,
+                currency TEXT NOT NULL,
+                period DATE NOT NULL,
+                open NUMERIC NOT NULL,
+                high NUMERIC NOT NULL,
+                low NUMERIC NOT NULL,
+                close NUMERIC NOT NULL,
+                mean REAL NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (level, currency, period)
+            ) WITHOUT ROWID
+            """
+        )
+        self.rebuild_rollups()
+
+    def _create_rollup_triggers(self):
+        # like the currency stats, kept current by triggers: the span of
+        # dates written per currency, whose periods commit() recomputes
+        self._exec(
+            """
+            CREATE TABLE IF NOT EXISTS CURSBNR_ROLLUP_DIRTY(
+                currency TEXT NOT NULL PRIMARY KEY,
+                first_date DATE NOT NULL,
+                last_date DATE NOT NULL
+            ) WITHOUT ROWID
+            """
+        )
+
+        mark = """
+            INSERT INTO CURSBNR_ROLLUP_DIRTY (currency, first_date, last_date)
+            VALUES ({row}.currency, {row}.date, {row}.date)
+            ON CONFLICT (currency) DO UPDATE SET
+                first_date = min(first_date, excluded.first_date),
+                last_date = max(last_date, excluded.last_date);
+        """
+        mark_new, mark_old = mark.format(row="NEW"), mark.format(row="OLD")
+        # rows without a value are in no rollup
+        for name, event, when, body in (
+            ("CURSBNR_ROLLUP_AFTER_INSERT", "INSERT", "NEW.value", mark_new),
+            ("CURSBNR_ROLLUP_AFTER_DELETE", "DELETE", "OLD.value", mark_old),
+            (
+                "CURSBNR_ROLLUP_AFTER_UPDATE",
+                "UPDATE",
+                "coalesce(OLD.value, NEW.value)",
+                mark_old + mark_new,
+            ),
+        ):
+            self._exec(
+                f"CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON CURSBNR"
+                f"\nWHEN {when} IS NOT NULL\nBEGIN{dedent(body)}END"
+            )
+
+    def _create_currency_index(self):
+        # the hot lookups go by currency first and only need these columns
+        self._exec(
+            """
+            CREATE INDEX IF NOT EXISTS CURSBNR_CURRENCY_DATE
+            ON CURSBNR (currency, date, value)
+            """
+        )
+
+    def _create_currency_table(self):
+        self._exec(
+            """
+            CREATE TABLE IF NOT EXISTS CURSBNR_CURRENCIES(
+                currency TEXT NOT NULL PRIMARY KEY,
+                first_date DATE NULL,
+                last_date DATE NULL,
+                row_count INTEGER NOT NULL,
+                value_count INTEGER NOT NULL
+            ) WITHOUT ROWID
+            """
+        )
+
+        # first/last only ever move outward on insert; on delete they are
+        # looked up again in CURSBNR_CURRENCY_DATE when the edge row goes
+        insert_new = """
+            INSERT INTO CURSBNR_CURRENCIES
+                (currency, first_date, last_date, row_count, value_count)
+            VALUES (
+                NEW.currency,
+                iif(NEW.value IS NULL, NULL, NEW.date),
+                iif(NEW.value IS NULL, NULL, NEW.date),
+                1,
+                NEW.value IS NOT NULL
+            )
+            ON CONFLICT (currency) DO UPDATE SET
+                first_date = coalesce(
+                    min(first_date, excluded.first_date),
+                    first_date,
+                    excluded.first_date
+                ),
+                last_date = coalesce(
+                    max(last_date, excluded.last_date),
+                    last_date,
+                    excluded.last_date
+                ),
+                row_count = row_count + 1,
+                value_count = value_count + excluded.value_count;
+        """
+        delete_old = """
+            UPDATE CURSBNR_CURRENCIES SET
+                first_date = iif(
+                    OLD.value IS NOT NULL AND OLD.date = first_date,
+                    (
+                        SELECT MIN(date) FROM CURSBNR
+                        WHERE currency = OLD.currency AND value IS NOT NULL
+                    ),
+                    first_date
+                ),
+                last_date = iif(
+                    OLD.value IS NOT NULL AND OLD.date = last_date,
+                    (
+                        SELECT MAX(date) FROM CURSBNR
+                        WHERE currency = OLD.currency AND value IS NOT NULL
+                    ),
+                    last_date
+                ),
+                row_count = row_count - 1,
+                value_count = value_count - (OLD.value IS NOT NULL)
+            WHERE currency = OLD.currency;
+            DELETE FROM CURSBNR_CURRENCIES
+            WHERE currency = OLD.currency AND row_count = 0;
+        """
+        for name, event, body in (
+            ("CURSBNR_AFTER_INSERT", "INSERT", insert_new),
+            ("CURSBNR_AFTER_DELETE", "DELETE", delete_old),
+            ("CURSBNR_AFTER_UPDATE", "UPDATE", delete_old + insert_new),
+        ):
+            self._exec(
+                f"CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON CURSBNR"
+                f"\nBEGIN{dedent(body)}END"
+            )
+
+        self.refresh_currency_stats()
+
     def _make_value_null(self):
         sql = self._exec_fetchone(
             "SELECT sql FROM sqlite_schema WHERE name == ?",
@@ -381,8 +1023,13 @@ class CursDB:
         finally:
             cursor.close()
 
-    def _exec_many(self, sql: str, param_rows: Iterable[list]) -> None:
-        self._conn.executemany(dedent(sql), param_rows).close()
+    def _exec_many(self, sql: str, param_rows: Iterable[list]) -> int:
+        # rows changed by the statements themselves, not by triggers
+        cursor = self._conn.executemany(dedent(sql), param_rows)
+        try:
+            return cursor.rowcount
+        finally:
+            cursor.close()
 
     @staticmethod
     def _sql_or_action(*, replace: bool | None = None):
@@ -0,0 +1,103 @@
+import asyncio
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import Executor
+from typing import Any, NamedTuple
+
+from curs.types import DateCurrencyOptValueRow
+
+__all__ = ("AsyncFetchEngine", "EngineStats", "FetchJob")
+
+FetchJob = tuple[Callable[..., Any], tuple]
+
+
+class EngineStats(NamedTuple):
+    jobs: int
+    rows: int
+    elapsed: float
+
+
+class AsyncFetchEngine:
+    def __init__(
+        self,
+        *,
+        concurrency: int,
+        put_rows: Callable[[list[DateCurrencyOptValueRow]], None],
+        executor: Executor | None = None,
+    ):
+        if concurrency < 1:
+            raise ValueError(f"invalid concurrency {concurrency!r}, need at least 1")
+        self._concurrency = concurrency
+        self._put_rows = put_rows
+        self._executor = executor
+
+    async def run(self, jobs: Iterable[FetchJob]) -> EngineStats:
+        loop = asyncio.get_running_loop()
+        window = asyncio.Semaphore(self._concurrency)
+        queue: asyncio.Queue[list[DateCurrencyOptValueRow] | None] = asyncio.Queue()
+        pending: set[asyncio.Task] = set()
+        failed: list[BaseException] = []
+
+        async def run_job(func: Callable[..., Any], args: tuple):
+            try:
+                result = await loop.run_in_executor(self._executor, func, *args)
+            finally:
+                window.release()
+
+            rows = [
+                row
+                for row in (result if isinstance(result, list) else (result,))
+                if row is not None
+            ]
+            if rows:
+                queue.put_nowait(rows)
+
+        def job_done(task: asyncio.Task):
+            pending.discard(task)
+            if not task.cancelled() and task.exception() is not None:
+                failed.append(task.exception())
+
+        start_time = time.perf_counter()
+        writer = asyncio.create_task(self._write(queue))
+        n_jobs = 0
+        try:
+            for func, args in jobs:
+                await window.acquire()
+                if failed:
+                    window.release()
+                    break
+
+                task = asyncio.create_task(run_job(func, args))
+                pending.add(task)
+                task.add_done_callback(job_done)
+                n_jobs += 1
+
+            if pending:
+                await asyncio.wait(set(pending))
+
+        finally:
+            for task in pending:
+                task.cancel()
+            queue.put_nowait(None)
+            n_rows = await writer
+
+        if failed:
+            raise failed[0]
+
+        return EngineStats(n_jobs, n_rows, time.perf_counter() - start_time)
+
+    async def _write(self, queue: asyncio.Queue) -> int:
+        n_rows = 0
+        while (rows := await queue.get()) is not None:
+            # drain whatever else is ready so that writes are batched
+            while not queue.empty():
+                more = queue.get_nowait()
+                if more is None:
+                    queue.put_nowait(None)
+                    break
+                rows.extend(more)
+
+            self._put_rows(rows)
+            n_rows += len(rows)
+
+        return n_rows
@@ -0,0 +1,189 @@
+import threading
+import time
+from collections.abc import Mapping
+from http.client import HTTPConnection, HTTPSConnection, RemoteDisconnected
+from typing import NamedTuple
+
+__all__ = ("ConnectionPool", "PoolStats", "Response")
+
+_HostKey = tuple[str, str, int | None]
+
+
+class Response(NamedTuple):
+    status: int
+    reason: str
+    headers: Mapping[str, str]
+    data: bytes
+
+
+class PoolStats(NamedTuple):
+    requests: int
+    connects: int
+    reused: int
+    discarded: int
+    connect_time: float
+
+    @property
+    def reuse_ratio(self) -> float:
+        return self.reused / self.requests if self.requests else 0.0
+
+    @property
+    def mean_connect_time(self) -> float:
+        return self.connect_time / self.connects if self.connects else 0.0
+
+
+class _HostSlots:
+    def __init__(self, max_connections: int):
+        self.slots = threading.BoundedSemaphore(max_connections)
+        self.idle: list[tuple[float, HTTPConnection]] = []
+
+
+class ConnectionPool:
+    # keep-alive connections shared by all threads, at most
+    # max_per_host of them per host; a connection is only handed out
+    # again after its previous response was read completely, so requests
+    # are never pipelined on one connection
+    def __init__(
+        self,
+        *,
+        max_per_host: int = 8,
+        idle_timeout: float = 30.0,
+        timeout: float | None = 30.0,
+    ):
+        if max_per_host < 1:
+            raise ValueError(f"invalid max_per_host {max_per_host!r}, need at least 1")
+        self._max_per_host = max_per_host
+        self._idle_timeout = idle_timeout
+        self._timeout = timeout
+        self._hosts: dict[_HostKey, _HostSlots] = {}
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._connects = 0
+        self._reused = 0
+        self._discarded = 0
+        self._connect_time = 0.0
+
+    @property
+    def stats(self) -> PoolStats:
+        with self._lock:
+            return PoolStats(
+                self._requests,
+                self._connects,
+                self._reused,
+                self._discarded,
+                self._connect_time,
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            hosts = list(self._hosts.values())
+        for host in hosts:
+            with self._lock:
+                idle, host.idle = host.idle, []
+            for _, conn in idle:
+                conn.close()
+
+    def request(
+        self,
+        scheme: str,
+        host: str,
+        port: int | None,
+        method: str,
+        path: str,
+        body: bytes | None = None,
+        headers: Mapping[str, str] = {},
+    ) -> Response:
+        key = (scheme, host, port)
+        slots = self._host_slots(key)
+        slots.slots.acquire()
+        try:
+            conn, reused = self._checkout(key, slots)
+            try:
+                response = self._send(conn, method, path, body, headers)
+            except (RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if not reused:
+                    raise
+                # the server dropped an idle keep-alive connection, retry once
+                conn, reused = self._connect(key), False
+                try:
+                    response = self._send(conn, method, path, body, headers)
+                except BaseException:
+                    conn.close()
+                    raise
+            except BaseException:
+                conn.close()
+                raise
+
+            with self._lock:
+                self._requests += 1
+                self._reused += reused
+
+            result, will_close = response
+            if will_close:
+                conn.close()
+            else:
+                with self._lock:
+                    slots.idle.append((time.monotonic(), conn))
+            return result
+
+        finally:
+            slots.slots.release()
+
+    def _host_slots(self, key: _HostKey) -> _HostSlots:
+        with self._lock:
+            slots = self._hosts.get(key, None)
+            if slots is None:
+                slots = _HostSlots(self._max_per_host)
+                self._hosts[key] = slots
+            return slots
+
+    def _checkout(
+        self, key: _HostKey, slots: _HostSlots
+    ) -> tuple[HTTPConnection, bool]:
+        now = time.monotonic()
+        stale = []
+        conn = None
+        with self._lock:
+            while slots.idle:
+                last_used, candidate = slots.idle.pop()
+                if now - last_used < self._idle_timeout:
+                    conn = candidate
+                    break
+                stale.append(candidate)
+            self._discarded += len(stale)
+
+        for candidate in stale:
+            candidate.close()
+
+        if conn is not None:
+            return conn, True
+        return self._connect(key), False
+
+    def _connect(self, key: _HostKey) -> HTTPConnection:
+        scheme, host, port = key
+        conn_type = HTTPSConnection if scheme == "https" else HTTPConnection
+        conn = conn_type(host, port, timeout=self._timeout)
+        start = time.perf_counter()
+        conn.connect()
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._connects += 1
+            self._connect_time += elapsed
+        return conn
+
+    @staticmethod
+    def _send(
+        conn: HTTPConnection,
+        method: str,
+        path: str,
+        body: bytes | None,
+        headers: Mapping[str, str],
+    ) -> tuple[Response, bool]:
+        conn.request(method, path, body, dict(headers))
+        response = conn.getresponse()
+        data = response.read()
+        return (
+            Response(response.status, response.reason, response.headers, data),
+            response.will_close,
+        )
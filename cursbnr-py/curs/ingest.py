@@ -0,0 +1,257 @@
+from collections.abc import Iterator, Sequence
+from pathlib import Path
+from typing import BinaryIO, NamedTuple
+
+import numpy as np
+
+from curs.db import CursDB
+from curs.types import Date, Numeric
+from curs.xml import iter_bnr_xml_batches
+
+__all__ = (
+    "RowArrays",
+    "RowMerger",
+    "iter_bnr_xml_arrays",
+    "read_bnr_xml_arrays",
+    "merge_row_arrays",
+    "iter_row_arrays",
+)
+
+
+class RowArrays(NamedTuple):
+    # (date, currency, value) rows as columns: cheap to pickle between
+    # processes, unlike a CursMap of dicts of dates
+    currencies: list[str]
+    codes: np.ndarray  # int32 indices into currencies
+    dates: np.ndarray  # datetime64[D]
+    values: np.ndarray  # float64, NaN for rows without a value
+
+
+def _empty() -> RowArrays:
+    return RowArrays(
+        [],
+        np.array([], dtype=np.int32),
+        np.array([], dtype="datetime64[D]"),
+        np.array([], dtype=np.float64),
+    )
+
+
+def iter_bnr_xml_arrays(
+    file: str | Path | BinaryIO, *, batch_size: int = 8192
+) -> Iterator[RowArrays]:
+    # a file's rows, in file order, about batch_size at a time
+    names: dict[str, int] = {}
+    for rows in iter_bnr_xml_batches(file, batch_size=batch_size):
+        date_column, currency_column, value_column = zip(*rows)
+        codes = np.fromiter(
+            (names.setdefault(name, len(names)) for name in currency_column),
+            dtype=np.int32,
+            count=len(rows),
+        )
+        # numpy parses the ISO dates and the numbers itself
+        yield RowArrays(
+            list(names),
+            codes,
+            np.array(date_column, dtype="datetime64[D]"),
+            np.array(
+                ["nan" if value is None else value for value in value_column],
+                dtype=np.float64,
+            ),
+        )
+
+
+def read_bnr_xml_arrays(file: str | Path | BinaryIO) -> RowArrays:
+    # all of a file's rows, in file order; runs in a worker process, so
+    # takes and returns only what pickles cheaply
+    batches = list(iter_bnr_xml_arrays(file))
+    if not batches:
+        return _empty()
+    return RowArrays(
+        batches[-1].currencies,
+        np.concatenate([batch.codes for batch in batches]),
+        np.concatenate([batch.dates for batch in batches]),
+        np.concatenate([batch.values for batch in batches]),
+    )
+
+
+def merge_row_arrays(batches: Sequence[RowArrays]) -> tuple[RowArrays, int]:
+    # one row per (date, currency), in currency, date order: a value wins
+    # over no value, and otherwise the later batch (or row) wins; also
+    # returns how many dropped rows disagreed with the one kept
+    batches = [batch for batch in batches if len(batch.codes)]
+    if not batches:
+        return _empty(), 0
+
+    currencies = sorted({name for batch in batches for name in batch.currencies})
+    index = {name: k for k, name in enumerate(currencies)}
+    codes = np.concatenate(
+        [
+            np.array([index[name] for name in batch.currencies], dtype=np.int32)[
+                batch.codes
+            ]
+            for batch in batches
+        ]
+    )
+    dates = np.concatenate([batch.dates for batch in batches])
+    values = np.concatenate([batch.values for batch in batches])
+    has_value = ~np.isnan(values)
+
+    # the last key sorts first; the row kept is the last of its group
+    order = np.lexsort((np.arange(len(codes)), has_value, dates, codes))
+    codes, dates, values = codes[order], dates[order], values[order]
+    last = np.ones(len(codes), dtype=bool)
+    last[:-1] = (codes[1:] != codes[:-1]) | (dates[1:] != dates[:-1])
+
+    # NaN == NaN is false, so compare with the kept row by position
+    kept = np.flatnonzero(last)
+    group_kept = kept[np.searchsorted(kept, np.arange(len(codes)))]
+    kept_values = values[group_kept]
+    same = (values == kept_values) | (np.isnan(values) & np.isnan(kept_values))
+    n_conflicts = int(np.count_nonzero(~last & ~same))
+
+    return RowArrays(currencies, codes[last], dates[last], values[last]), n_conflicts
+
+
+def iter_row_arrays(
+    arrays: RowArrays, *, batch_size: int = 8192
+) -> Iterator[list[tuple[Date, str, Numeric | None]]]:
+    # back to rows for CursDB.insert_many_values, a batch at a time
+    currencies = arrays.currencies
+    for start in range(0, len(arrays.codes), batch_size):
+        stop = start + batch_size
+        dates = arrays.dates[start:stop].tolist()
+        codes = arrays.codes[start:stop].tolist()
+        values = arrays.values[start:stop].tolist()
+        yield [
+            (date, currencies[code], None if value != value else value)
+            for date, code, value in zip(dates, codes, values)
+        ]
+
+
+class RowMerger:
+    # writes the rows of several files (or of one file's batches) to the
+    # database one at a time, in order, the same as merge_row_arrays over
+    # all of them would; only their (currency, date) keys and values are
+    # kept in between.
+    # Without replace, rows the database had before are left alone.
+    def __init__(self, db: CursDB, *, replace: bool = False, batch_size: int = 8192):
+        self._db = db
+        self._replace = replace
+        self._batch_size = batch_size
+        self._currencies: list[str] = []
+        self._codes: dict[str, int] = {}
+        # sorted keys written so far, their values, and whether a later
+        # file may still overwrite them
+        self._keys = np.array([], dtype=np.int64)
+        self._values = np.array([], dtype=np.float64)
+        self._owned = np.array([], dtype=bool)
+        self.rows_read = 0
+        self.rows_written = 0
+        self.conflicts = 0
+
+    @property
+    def n_unique(self) -> int:
+        return len(self._keys)
+
+    def add(self, arrays: RowArrays) -> int:
+        self.rows_read += len(arrays.codes)
+        if not len(arrays.codes):
+            return 0
+
+        keys, codes, dates, values = self._sorted(arrays)
+        if np.any(keys[1:] == keys[:-1]):
+            # the same rate twice in one file: merged as if across files
+            arrays, n_conflicts = merge_row_arrays([arrays])
+            self.conflicts += n_conflicts
+            keys, codes, dates, values = self._sorted(arrays)
+
+        pos = np.searchsorted(self._keys, keys)
+        found = np.zeros(len(keys), dtype=bool)
+        inside = pos < len(self._keys)
+        found[inside] = self._keys[pos[inside]] == keys[inside]
+
+        # keys from an earlier file: a value wins over no value, and
+        # otherwise this file does
+        seen = np.flatnonzero(found)
+        at = pos[seen]
+        old, new = self._values[at], values[seen]
+        same = (old == new) | (np.isnan(old) & np.isnan(new))
+        self.conflicts += int(np.count_nonzero(~same))
+        wins = ~same & ~np.isnan(new)
+        self._values[at[wins]] = new[wins]
+        update = seen[wins & self._owned[at]]
+        rows = RowArrays(self._currencies, codes, dates, values)
+        written = self._write(rows, update, True)
+
+        # keys new to this merge
+        fresh = np.flatnonzero(~found)
+        if self._replace:
+            owned = np.ones(len(fresh), dtype=bool)
+        else:
+            owned = ~self._in_db(codes[fresh], dates[fresh])
+        insert = fresh[owned]
+        written += self._write(rows, insert, self._replace)
+        if len(fresh):
+            self._keys = np.insert(self._keys, pos[fresh], keys[fresh])
+            self._values = np.insert(self._values, pos[fresh], values[fresh])
+            self._owned = np.insert(self._owned, pos[fresh], owned)
+
+        self.rows_written += written
+        return written
+
+    def _sorted(self, arrays: RowArrays) -> tuple[np.ndarray, ...]:
+        # keys, codes, dates and values by key, with codes of this merge
+        codes = np.array(
+            [self._code(name) for name in arrays.currencies], dtype=np.int32
+        )[arrays.codes]
+        keys = (codes.astype(np.int64) << 32) | (
+            arrays.dates.astype(np.int64) + (1 << 31)
+        )
+        if np.all(keys[1:] > keys[:-1]):
+            # files list currencies in the same order, so usually they are
+            return keys, codes, arrays.dates, arrays.values
+        order = np.argsort(keys)
+        return keys[order], codes[order], arrays.dates[order], arrays.values[order]
+
+    def _code(self, currency: str) -> int:
+        code = self._codes.get(currency)
+        if code is None:
+            code = self._codes[currency] = len(self._currencies)
+            self._currencies.append(currency)
+        return code
+
+    def _in_db(self, codes: np.ndarray, dates: np.ndarray) -> np.ndarray:
+        # which rows are in the database already, one index range per currency
+        result = np.zeros(len(codes), dtype=bool)
+        for code in np.unique(codes):
+            rows = codes == code
+            cursor = self._db.connection.execute(
+                "SELECT CAST(date AS TEXT) FROM CURSBNR"
+                " WHERE currency = ? AND date BETWEEN ? AND ?",
+                (
+                    self._currencies[code],
+                    str(dates[rows].min()),
+                    str(dates[rows].max()),
+                ),
+            )
+            try:
+                known = np.array([date for date, in cursor], dtype="datetime64[D]")
+            finally:
+                cursor.close()
+            result[rows] = np.isin(dates[rows], known)
+        return result
+
+    def _write(self, arrays: RowArrays, rows: np.ndarray, replace: bool) -> int:
+        # the given rows of `arrays`, a batch at a time, never all copied
+        written = 0
+        for start in range(0, len(rows), self._batch_size):
+            batch = rows[start : start + self._batch_size]
+            part = RowArrays(
+                arrays.currencies,
+                arrays.codes[batch],
+                arrays.dates[batch],
+                arrays.values[batch],
+            )
+            for part_rows in iter_row_arrays(part, batch_size=self._batch_size):
+                written += self._db.insert_many_values(part_rows, replace=replace)
+        return written
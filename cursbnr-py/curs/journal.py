@@ -0,0 +1,167 @@
+import threading
+from collections.abc import Iterable
+
+from curs.db import CursDB
+from curs.plan import FetchPlan
+from curs.types import DateCurrencyRow, _DateT, require_str, to_date
+
+__all__ = ("WorkJournal", "PLANNED", "IN_FLIGHT", "DONE", "FAILED")
+
+PLANNED = "planned"
+IN_FLIGHT = "in_flight"
+DONE = "done"
+FAILED = "failed"  # permanently, skipped by later plans
+
+
+class WorkJournal:
+    TABLE = "CURSBNR_JOBS"
+
+    def __init__(self, db: CursDB, *, max_failures: int = 3):
+        self._db = db
+        self._max_failures = max_failures
+        self._lock = threading.Lock()
+        self._started: list[tuple] = []
+        self._failed: list[tuple] = []
+        self._completed: list[tuple] = []
+        self._released: list[tuple] = []
+
+        if not self._db.read_only:
+            self._db.connection.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.TABLE}(
+                    date DATE NOT NULL,
+                    currency TEXT NOT NULL,
+                    state TEXT NOT NULL DEFAULT '{PLANNED}',
+                    failures INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT NULL,
+                    PRIMARY KEY (date, currency)
+                ) WITHOUT ROWID
+                """).close()
+
+    @property
+    def has_work(self) -> bool:
+        return bool(
+            self._fetchone(
+                f"SELECT EXISTS(SELECT 1 FROM {self.TABLE} WHERE state IN (?, ?))",
+                (PLANNED, IN_FLIGHT),
+            )[0]
+        )
+
+    def counts(self) -> dict[str, int]:
+        cursor = self._db.connection.execute(
+            f"SELECT state, COUNT(*) FROM {self.TABLE} GROUP BY state"
+        )
+        try:
+            return dict(cursor)
+        finally:
+            cursor.close()
+
+    def replan(self, plan: FetchPlan) -> FetchPlan:
+        # forget everything but the permanent failures, which stay excluded
+        failed = self._select_cells(FAILED)
+        self._db.connection.execute(
+            f"DELETE FROM {self.TABLE} WHERE state != ?", (FAILED,)
+        ).close()
+
+        plan = plan.excluding(failed)
+        self._db.connection.executemany(
+            f"INSERT OR IGNORE INTO {self.TABLE} (date, currency) VALUES (?, ?)",
+            plan.cells(),
+        ).close()
+        return plan
+
+    def pending_plan(self) -> FetchPlan:
+        return FetchPlan.from_cells(
+            self._select_cells(PLANNED) + self._select_cells(IN_FLIGHT)
+        )
+
+    def prune(self) -> None:
+        # done cells are in CURSBNR already, only the rest is resumed
+        self._db.connection.execute(
+            f"DELETE FROM {self.TABLE} WHERE state = ?", (DONE,)
+        ).close()
+
+    # the following may be called from any thread; they are buffered
+    # until flush() is called from the thread that owns the connection
+
+    def start(self, date: _DateT, currencies: Iterable[str]) -> None:
+        date = to_date(date)
+        with self._lock:
+            self._started.extend((date, require_str(c)) for c in currencies)
+
+    def complete(self, rows: Iterable[tuple]) -> None:
+        with self._lock:
+            self._completed.extend(
+                (to_date(date), require_str(currency)) for date, currency, *_ in rows
+            )
+
+    def fail(self, date: _DateT, currency: str, error: str, *, permanent: bool) -> None:
+        with self._lock:
+            self._failed.append(
+                (to_date(date), require_str(currency), error, permanent)
+            )
+
+    def release(self, date: _DateT, currency: str) -> None:
+        # started, but not asked for after all: planned again
+        with self._lock:
+            self._released.append((to_date(date), require_str(currency)))
+
+    def flush(self) -> None:
+        with self._lock:
+            started, self._started = self._started, []
+            failed, self._failed = self._failed, []
+            completed, self._completed = self._completed, []
+            released, self._released = self._released, []
+
+        conn = self._db.connection
+        conn.executemany(
+            f"""
+            UPDATE {self.TABLE} SET state = '{IN_FLIGHT}'
+            WHERE date = ? AND currency = ? AND state = '{PLANNED}'
+            """,
+            started,
+        ).close()
+        conn.executemany(
+            f"""
+            UPDATE {self.TABLE} SET
+                failures = failures + 1,
+                last_error = ?,
+                state = CASE
+                    WHEN ? AND failures + 1 >= ? THEN '{FAILED}'
+                    ELSE '{PLANNED}'
+                END
+            WHERE date = ? AND currency = ?
+            """,
+            (
+                (error, permanent, self._max_failures, date, currency)
+                for date, currency, error, permanent in failed
+            ),
+        ).close()
+        conn.executemany(
+            f"UPDATE {self.TABLE} SET state = '{DONE}' WHERE date = ? AND currency = ?",
+            completed,
+        ).close()
+        conn.executemany(
+            f"""
+            UPDATE {self.TABLE} SET state = '{PLANNED}'
+            WHERE date = ? AND currency = ? AND state = '{IN_FLIGHT}'
+            """,
+            released,
+        ).close()
+
+    def _select_cells(self, state: str) -> list[DateCurrencyRow]:
+        cursor = self._db.connection.execute(
+            f"SELECT date, currency FROM {self.TABLE} WHERE state = ?", (state,)
+        )
+        try:
+            return [
+                DateCurrencyRow(to_date(date), currency) for date, currency in cursor
+            ]
+        finally:
+            cursor.close()
+
+    def _fetchone(self, sql: str, params: tuple = ()):
+        cursor = self._db.connection.execute(sql, params)
+        try:
+            return cursor.fetchone()
+        finally:
+            cursor.close()
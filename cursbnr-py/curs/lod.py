@@ -0,0 +1,49 @@
+import numpy as np
+
+__all__ = ("m4_indices", "m4_decimate")
+
+
+def m4_indices(
+    x: np.ndarray,
+    y: np.ndarray,
+    x_range: tuple[float, float],
+    n_buckets: int,
+) -> np.ndarray:
+    # M4: per pixel column keep the first, last, lowest and highest point,
+    # which draws the same line as all of them; `x` must be sorted
+    if n_buckets < 1:
+        raise ValueError(f"invalid number of buckets {n_buckets!r}")
+
+    x0, x1 = x_range
+    # one more point on either side, so lines run on past the edges
+    lo = max(np.searchsorted(x, x0, side="left") - 1, 0)
+    hi = min(np.searchsorted(x, x1, side="right") + 1, len(x))
+    if hi - lo <= 4 * n_buckets:
+        return np.arange(lo, hi)
+
+    xs, ys = x[lo:hi], y[lo:hi]
+    width = (x1 - x0) or 1.0
+    buckets = np.clip(((xs - x0) * (n_buckets / width)).astype(np.int64), -1, n_buckets)
+
+    # ordered by bucket, then value: each bucket's first and last are its
+    # min and max; by bucket alone (x is sorted): its first and last in time
+    by_value = np.lexsort((ys, buckets))
+    starts = np.flatnonzero(np.diff(buckets, prepend=buckets[0] - 1))
+    ends = np.append(starts[1:], len(buckets)) - 1
+
+    keep = np.concatenate((starts, ends, by_value[starts], by_value[ends]))
+    return lo + np.unique(keep)
+
+
+def m4_decimate(
+    x: np.ndarray,
+    y: np.ndarray,
+    x_range: tuple[float, float] | None,
+    n_buckets: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    if not len(x):
+        return x, y
+    if x_range is None:
+        x_range = x[0], x[-1]
+    indices = m4_indices(x, y, x_range, n_buckets)
+    return x[indices], y[indices]
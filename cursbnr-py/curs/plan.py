@@ -0,0 +1,184 @@
+from collections.abc import Iterable, Iterator, Mapping
+from itertools import groupby
+from typing import NamedTuple
+
+import numpy as np
+
+from curs.presence import PresenceIndex
+from curs.pubcalendar import PublicationCalendar
+from curs.types import Date, DateCurrencyRow, _DateT, to_date
+
+__all__ = ("FetchPlan", "Run", "plan_missing")
+
+
+class Run(NamedTuple):
+    currency: str
+    start: Date
+    end: Date
+
+    @property
+    def days(self) -> int:
+        return (self.end - self.start).days + 1
+
+
+class FetchPlan:
+    def __init__(
+        self,
+        start_date: _DateT,
+        missing: Mapping[str, np.ndarray],
+        closed: Mapping[str, np.ndarray] | None = None,
+    ):
+        self._start = to_date(start_date).toordinal()
+        # currency -> sorted, unique day offsets from start_date
+        self._missing = {
+            currency: offsets for currency, offsets in missing.items() if len(offsets)
+        }
+        # cells on days that are known not to be published, no request needed
+        self.closed = FetchPlan(start_date, closed) if closed is not None else None
+
+    @classmethod
+    def from_cells(cls, cells: Iterable[tuple[_DateT, str]]) -> "FetchPlan":
+        ordinals: dict[str, list[int]] = {}
+        for date, currency in cells:
+            ordinals.setdefault(currency, []).append(to_date(date).toordinal())
+
+        if not ordinals:
+            return cls(Date.today(), {})
+
+        start = min(min(days) for days in ordinals.values())
+        return cls(
+            Date.fromordinal(start),
+            {
+                currency: np.unique(np.array(days, dtype=np.int64) - start)
+                for currency, days in ordinals.items()
+            },
+        )
+
+    def __len__(self) -> int:
+        return sum(len(offsets) for offsets in self._missing.values())
+
+    @property
+    def date_range(self) -> tuple[Date | None, Date | None]:
+        if not self._missing:
+            return None, None
+        first = min(int(offsets[0]) for offsets in self._missing.values())
+        last = max(int(offsets[-1]) for offsets in self._missing.values())
+        return Date.fromordinal(self._start + first), Date.fromordinal(
+            self._start + last
+        )
+
+    def excluding(self, cells: Iterable[tuple[_DateT, str]]) -> "FetchPlan":
+        drop: dict[str, list[int]] = {}
+        for date, currency in cells:
+            if currency in self._missing:
+                drop.setdefault(currency, []).append(
+                    to_date(date).toordinal() - self._start
+                )
+
+        missing = {
+            currency: (
+                np.setdiff1d(offsets, drop[currency]) if currency in drop else offsets
+            )
+            for currency, offsets in self._missing.items()
+        }
+        plan = FetchPlan(Date.fromordinal(self._start), missing)
+        plan.closed = self.closed
+        return plan
+
+    @property
+    def currencies(self) -> list[str]:
+        return sorted(self._missing.keys())
+
+    @property
+    def runs(self) -> list[Run]:
+        runs = []
+        for currency in self.currencies:
+            offsets = self._missing[currency]
+            breaks = np.flatnonzero(np.diff(offsets) != 1) + 1
+            for run in np.split(offsets, breaks):
+                runs.append(
+                    Run(
+                        currency,
+                        Date.fromordinal(self._start + int(run[0])),
+                        Date.fromordinal(self._start + int(run[-1])),
+                    )
+                )
+        return runs
+
+    def days(self) -> Iterator[tuple[Date, list[str]]]:
+        # latest day first, as a backfill should make the recent past usable early
+        currencies = self.currencies
+        if not currencies:
+            return
+        offsets = np.concatenate([self._missing[c] for c in currencies])
+        indices = np.concatenate(
+            [np.full(len(self._missing[c]), i) for i, c in enumerate(currencies)]
+        )
+        order = np.lexsort((indices, -offsets))
+        pairs = zip(offsets[order].tolist(), indices[order].tolist())
+        for offset, group in groupby(pairs, key=lambda pair: pair[0]):
+            yield (
+                Date.fromordinal(self._start + offset),
+                [currencies[i] for _, i in group],
+            )
+
+    def cells(self) -> Iterator[DateCurrencyRow]:
+        for date, currencies in self.days():
+            for currency in currencies:
+                yield DateCurrencyRow(date, currency)
+
+    def count_days(self) -> int:
+        if not self._missing:
+            return 0
+        return len(np.unique(np.concatenate(list(self._missing.values()))))
+
+    def count_requests(self, *, bulk: bool = False) -> int:
+        if not bulk:
+            return len(self)
+        # one getvalueadv for the stale-date check, plus one getall on days
+        # with other currencies left to fetch
+        return sum(min(len(currencies), 2) for _, currencies in self.days())
+
+
+def plan_missing(
+    presence: PresenceIndex,
+    currencies: Iterable[str],
+    *,
+    start_date: _DateT,
+    end_date: _DateT,
+    before_first_valid_date: Mapping[str, Date] = {},
+    last_valid_date: Mapping[str, Date] = {},
+    calendar: PublicationCalendar | None = None,
+) -> FetchPlan:
+    start = to_date(start_date).toordinal()
+    end = to_date(end_date).toordinal()
+
+    closed_mask = None
+    if calendar is not None:
+        closed_mask = calendar.closed_mask(start_date, end_date)
+
+    missing: dict[str, np.ndarray] = {}
+    closed: dict[str, np.ndarray] = {}
+    for currency in set(currencies):
+        first = start
+        last = end
+        if currency in before_first_valid_date:
+            first = max(first, before_first_valid_date[currency].toordinal() + 1)
+        if currency in last_valid_date:
+            last = min(last, last_valid_date[currency].toordinal())
+        if last < first:
+            continue
+
+        present = presence.present(
+            currency, (Date.fromordinal(first), Date.fromordinal(last))
+        )
+        offsets = np.flatnonzero(~present) + (first - start)
+
+        if closed_mask is None:
+            missing[currency] = offsets
+        else:
+            is_closed = closed_mask[offsets]
+            missing[currency] = offsets[~is_closed]
+            closed[currency] = offsets[is_closed]
+
+    return FetchPlan(start_date, missing, closed if calendar is not None else None)
@@ -0,0 +1,97 @@
+from collections.abc import Iterable
+from itertools import groupby
+from operator import itemgetter
+
+import numpy as np
+
+from curs.db import CursDB
+from curs.types import Date, _DateT, to_date
+
+__all__ = ("PresenceIndex",)
+
+
+class PresenceIndex:
+    def __init__(self, start_date: _DateT, end_date: _DateT):
+        self._start = to_date(start_date).toordinal()
+        self._end = to_date(end_date).toordinal()
+        if self._end < self._start:
+            raise ValueError(f"invalid date range {start_date!s} .. {end_date!s}")
+        self._days: dict[str, np.ndarray] = {}
+
+    @classmethod
+    def load(
+        cls,
+        db: CursDB,
+        start_date: _DateT,
+        end_date: _DateT,
+        currencies: Iterable[str] | None = None,
+    ) -> "PresenceIndex":
+        index = cls(start_date, end_date)
+        if currencies is not None:
+            currencies = list(currencies)
+        for currency in currencies or ():
+            index._bitmap(currency)
+
+        rows = db.select_currency_ordinals(
+            date=(start_date, end_date),
+            currency=currencies,
+            value_is_null=None,
+        )
+        for currency, group in groupby(rows, key=itemgetter(0)):
+            offsets = np.fromiter((ordinal for _, ordinal in group), dtype=np.int64)
+            index._bitmap(currency)[offsets - index._start] = True
+
+        return index
+
+    @property
+    def date_range(self) -> tuple[Date, Date]:
+        return Date.fromordinal(self._start), Date.fromordinal(self._end)
+
+    @property
+    def currencies(self) -> list[str]:
+        return sorted(self._days.keys())
+
+    @property
+    def nbytes(self) -> int:
+        return sum(days.nbytes for days in self._days.values())
+
+    def __contains__(self, date_currency: tuple[_DateT, str]) -> bool:
+        date, currency = date_currency
+        days = self._days.get(currency, None)
+        if days is None:
+            return False
+        offset = to_date(date).toordinal() - self._start
+        return 0 <= offset < len(days) and bool(days[offset])
+
+    def add(self, date: _DateT, currency: str) -> None:
+        offset = to_date(date).toordinal() - self._start
+        if 0 <= offset <= self._end - self._start:
+            self._bitmap(currency)[offset] = True
+
+    def add_rows(self, rows: Iterable[tuple]) -> None:
+        for date, currency, *_ in rows:
+            self.add(date, currency)
+
+    def present(
+        self, currency: str, date_range: tuple[_DateT, _DateT] | None = None
+    ) -> np.ndarray:
+        first, last = self._start, self._end
+        if date_range is not None:
+            first, last = (to_date(date).toordinal() for date in date_range)
+
+        result = np.zeros(max(last - first + 1, 0), dtype=bool)
+        days = self._days.get(currency, None)
+        if days is not None:
+            lo, hi = max(first, self._start), min(last, self._end)
+            if lo <= hi:
+                result[lo - first : hi - first + 1] = days[
+                    lo - self._start : hi - self._start + 1
+                ]
+        return result
+
+    def _bitmap(self, currency: str) -> np.ndarray:
+        days = self._days.get(currency, None)
+        if days is None:
+            days = np.zeros(self._end - self._start + 1, dtype=bool)
+            self._days[currency] = days
+        return days
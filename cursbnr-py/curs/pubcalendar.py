@@ -0,0 +1,92 @@
+from collections.abc import Iterable, Mapping
+
+import numpy as np
+
+from curs.db import CursDB
+from curs.types import Date, _DateT, to_date
+
+__all__ = ("PublicationCalendar",)
+
+
+class PublicationCalendar:
+    SENTINELS = ("EUR", "USD")
+    WEEKEND = (5, 6)
+
+    def __init__(
+        self,
+        *,
+        closed_weekdays: Iterable[int] = WEEKEND,
+        sentinels: Iterable[str] = SENTINELS,
+        before_first_valid_date: Mapping[str, Date] = {},
+    ):
+        self._closed_weekdays = frozenset(closed_weekdays)
+        self._sentinels = tuple(sentinels)
+        self._before_first_valid_date = dict(before_first_valid_date)
+        self._closed: set[int] = set()
+        self._open: set[int] = set()
+
+    @classmethod
+    def load(
+        cls,
+        db: CursDB,
+        date_range: tuple[_DateT, _DateT] | None = None,
+        **kwargs,
+    ) -> "PublicationCalendar":
+        calendar = cls(**kwargs)
+        for date in db.get_dates(date=date_range, has_values=False):
+            calendar.mark_closed(date)
+        for date in db.get_dates(date=date_range, has_values=True):
+            calendar.mark_open(date)
+        return calendar
+
+    @property
+    def sentinels(self) -> tuple[str, ...]:
+        return self._sentinels
+
+    def is_closed(self, date: _DateT) -> bool:
+        ordinal = to_date(date).toordinal()
+        if ordinal in self._open:
+            return False
+        return ordinal in self._closed or self._is_closed_weekday(ordinal)
+
+    def mark_closed(self, date: _DateT) -> None:
+        ordinal = to_date(date).toordinal()
+        if ordinal not in self._open:
+            self._closed.add(ordinal)
+
+    def mark_open(self, date: _DateT) -> None:
+        ordinal = to_date(date).toordinal()
+        self._closed.discard(ordinal)
+        self._open.add(ordinal)
+
+    def closed_mask(self, start_date: _DateT, end_date: _DateT) -> np.ndarray:
+        start = to_date(start_date).toordinal()
+        end = to_date(end_date).toordinal()
+        ordinals = np.arange(start, end + 1)
+
+        mask = np.isin((ordinals - 1) % 7, list(self._closed_weekdays))
+        if self._closed:
+            mask |= np.isin(ordinals, list(self._closed))
+        if self._open:
+            mask &= ~np.isin(ordinals, list(self._open))
+        return mask
+
+    def sentinel_first(self, date: _DateT, currencies: Iterable[str]) -> list[str]:
+        date = to_date(date)
+        currencies = list(currencies)
+        sentinels = [
+            currency
+            for currency in self._sentinels
+            if currency in currencies and self._is_valid(currency, date)
+        ]
+        return sentinels + [c for c in currencies if c not in sentinels]
+
+    def is_sentinel(self, date: _DateT, currency: str) -> bool:
+        return currency in self._sentinels and self._is_valid(currency, to_date(date))
+
+    def _is_valid(self, currency: str, date: Date) -> bool:
+        first = self._before_first_valid_date.get(currency, None)
+        return first is None or date > first
+
+    def _is_closed_weekday(self, ordinal: int) -> bool:
+        return (ordinal - 1) % 7 in self._closed_weekdays
@@ -0,0 +1,266 @@
+import random
+import re
+import threading
+import time
+from collections.abc import Callable, Hashable
+from http.client import HTTPException
+from typing import NamedTuple, TypeVar
+from xml.etree.ElementTree import ParseError
+
+from curs.soap import SoapFault
+from suds import WebFault
+from suds.transport import TransportError
+
+__all__ = (
+    "PERMANENT_ERRORS",
+    "TRANSIENT_ERRORS",
+    "AimdLimiter",
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "RequestScheduler",
+    "RetryPolicy",
+    "SchedulerStats",
+    "TokenBucket",
+    "is_not_listed",
+)
+
+_T = TypeVar("_T")
+
+TRANSIENT_ERRORS: tuple[type[BaseException], ...] = (
+    OSError,  # also socket timeouts, URLError and ConnectionError
+    HTTPException,  # also SoapHTTPError
+    TransportError,
+    ParseError,  # truncated responses
+)
+PERMANENT_ERRORS: tuple[type[BaseException], ...] = (WebFault, SoapFault)
+
+_NOT_LISTED = re.compile(r"Object reference not set to an instance of an object\.")
+
+
+def is_not_listed(ex: BaseException) -> bool:
+    # the service's null-reference fault for a currency it did not list on
+    # the requested date, unlike faults of the server itself
+    return isinstance(ex, PERMANENT_ERRORS) and bool(_NOT_LISTED.search(str(ex)))
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float | None = None):
+        if rate <= 0:
+            raise ValueError(f"invalid rate {rate!r}, need a positive number")
+        self._rate = rate
+        self._burst = max(burst if burst is not None else rate, 1.0)
+        self._tokens = self._burst
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self._burst, self._tokens + (now - self._stamp) * self._rate
+                )
+                self._stamp = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self._rate
+            time.sleep(wait)
+
+
+class AimdLimiter:
+    # additive increase / multiplicative decrease of the number of requests
+    # allowed in flight, driven by errors and by latency above the target
+    def __init__(
+        self,
+        *,
+        initial: int = 4,
+        minimum: int = 1,
+        maximum: int = 64,
+        target_latency: float = 2.0,
+        decrease_factor: float = 0.5,
+    ):
+        if not 1 <= minimum <= maximum:
+            raise ValueError(f"invalid limits {minimum!r} .. {maximum!r}")
+        self._min = minimum
+        self._max = maximum
+        self._limit = float(min(max(initial, minimum), maximum))
+        self._target_latency = target_latency
+        self._decrease_factor = decrease_factor
+        self._in_flight = 0
+        self._cond = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self._in_flight >= int(self._limit):
+                self._cond.wait()
+            self._in_flight += 1
+
+    def release(self, *, ok: bool, latency: float) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            if ok and latency <= self._target_latency:
+                self._limit = min(self._max, self._limit + 1 / max(self._limit, 1))
+            else:
+                self._limit = max(self._min, self._limit * self._decrease_factor)
+            self._cond.notify_all()
+
+
+class RetryPolicy(NamedTuple):
+    retries: int = 5
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+
+    def delay(self, attempt: int) -> float:
+        # "full jitter" exponential backoff
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+
+class CircuitBreaker:
+    def __init__(self, *, threshold: int = 3, cooldown: float | None = None):
+        self._threshold = threshold
+        self._cooldown = cooldown
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            if (
+                self._cooldown is not None
+                and time.monotonic() - self._opened_at >= self._cooldown
+            ):
+                # half-open: let the next call through, one failure reopens it
+                self._opened_at = None
+                self._failures = self._threshold - 1
+                return False
+            return True
+
+    def record(self, *, ok: bool) -> bool:
+        with self._lock:
+            if ok:
+                self._failures = 0
+                self._opened_at = None
+            else:
+                self._failures += 1
+                if self._failures >= self._threshold and self._opened_at is None:
+                    self._opened_at = time.monotonic()
+                    return True
+            return False
+
+
+class SchedulerStats(NamedTuple):
+    requests: int
+    retries: int
+    failures: int
+    limit: int
+
+
+class RequestScheduler:
+    def __init__(
+        self,
+        *,
+        rate: float | None = None,
+        limiter: AimdLimiter | None = None,
+        retry: RetryPolicy = RetryPolicy(),
+        breaker_threshold: int = 3,
+        breaker_cooldown: float | None = None,
+        on_circuit_open: Callable[[Hashable], None] | None = None,
+    ):
+        self._bucket = TokenBucket(rate) if rate is not None else None
+        self._limiter = limiter if limiter is not None else AimdLimiter()
+        self._retry = retry
+        self._breaker_threshold = breaker_threshold
+        self._breaker_cooldown = breaker_cooldown
+        self._on_circuit_open = on_circuit_open
+        self._breakers: dict[Hashable, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._retries = 0
+        self._failures = 0
+
+    @property
+    def stats(self) -> SchedulerStats:
+        with self._lock:
+            return SchedulerStats(
+                self._requests, self._retries, self._failures, self._limiter.limit
+            )
+
+    def breaker(self, key: Hashable) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(key, None)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    threshold=self._breaker_threshold, cooldown=self._breaker_cooldown
+                )
+                self._breakers[key] = breaker
+            return breaker
+
+    def is_open(self, key: Hashable) -> bool:
+        return self.breaker(key).is_open
+
+    def call(
+        self, func: Callable[..., _T], /, *args, key: Hashable | None = None
+    ) -> _T:
+        breaker = self.breaker(key) if key is not None else None
+        if breaker is not None and breaker.is_open:
+            raise CircuitOpenError(key)
+
+        attempt = 0
+        while True:
+            if self._bucket is not None:
+                self._bucket.acquire()
+            self._limiter.acquire()
+            start = time.monotonic()
+            ok = False
+            overloaded = False
+            try:
+                with self._lock:
+                    self._requests += 1
+                result = func(*args)
+                ok = True
+
+            except PERMANENT_ERRORS as ex:
+                self._count_failure()
+                # only unlisted currencies trip the breaker, for good
+                # without a cooldown; other server faults may pass
+                if breaker is not None and is_not_listed(ex):
+                    if breaker.record(ok=False) and self._on_circuit_open is not None:
+                        self._on_circuit_open(key)
+                raise
+
+            except TRANSIENT_ERRORS:
+                overloaded = True
+                if attempt >= self._retry.retries:
+                    self._count_failure()
+                    raise
+
+            finally:
+                self._limiter.release(
+                    ok=not overloaded, latency=time.monotonic() - start
+                )
+
+            if ok:
+                if breaker is not None:
+                    breaker.record(ok=True)
+                return result
+
+            with self._lock:
+                self._retries += 1
+            time.sleep(self._retry.delay(attempt))
+            attempt += 1
+
+    def _count_failure(self):
+        with self._lock:
+            self._failures += 1
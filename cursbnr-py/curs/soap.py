@@ -0,0 +1,151 @@
+import datetime as dt
+from http.client import HTTPException
+from urllib.parse import urlsplit
+from xml.etree.ElementTree import ParseError, XMLPullParser
+from xml.sax.saxutils import escape
+
+from curs.http import ConnectionPool
+
+__all__ = ("SoapFault", "SoapHTTPError", "SoapTransport")
+
+_NS = "http://www.infovalutar.ro/"
+
+_ENVELOPE = (
+    '<?xml version="1.0" encoding="utf-8"?>'
+    '<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/">'
+    "<soap:Body>{body}</soap:Body>"
+    "</soap:Envelope>"
+)
+
+
+def _template(operation: str, *params: str) -> str:
+    body = f'<{operation} xmlns="{_NS}">'
+    body += "".join(f"<{param}>{{{param}}}</{param}>" for param in params)
+    body += f"</{operation}>"
+    return _ENVELOPE.replace("{body}", body)
+
+
+_TEMPLATES = {
+    "getall": _template("getall", "dt"),
+    "getvalue": _template("getvalue", "TheDate", "Moneda"),
+    "getvalueadv": _template("getvalueadv", "thedate", "themoneda"),
+    "lastdateinserted": _template("lastdateinserted"),
+    "getlatestvalue": _template("getlatestvalue", "Moneda"),
+}
+
+
+class SoapFault(Exception):
+    def __init__(self, faultcode: str | None, faultstring: str | None):
+        super().__init__(f"Server raised fault: '{faultstring}'")
+        self.faultcode = faultcode
+        self.faultstring = faultstring
+
+
+class SoapHTTPError(HTTPException):
+    def __init__(self, status: int, reason: str):
+        super().__init__(f"HTTP {status} {reason}")
+        self.status = status
+        self.reason = reason
+
+
+def _local(tag: str) -> str:
+    return tag.rpartition("}")[2]
+
+
+def _to_datetime(text: str) -> dt.datetime:
+    return dt.datetime.fromisoformat(text.strip())
+
+
+class SoapTransport:
+    # speaks just enough SOAP 1.1 for the infovalutar.ro operations we use;
+    # safe to share between threads
+    def __init__(self, url: str, *, pool: ConnectionPool | None = None):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"invalid url {url!r}, need http or https")
+        self._scheme = parts.scheme
+        self._host = parts.hostname
+        self._port = parts.port
+        self._path = parts.path or "/"
+        self._pool = pool if pool is not None else ConnectionPool()
+
+    @property
+    def pool(self) -> ConnectionPool:
+        return self._pool
+
+    def getall(self, date: dt.datetime) -> list[tuple[str, str]]:
+        events = self._call("getall", dt=date.isoformat())
+        result = []
+        moneda = value = None
+        for elem in events:
+            tag = _local(elem.tag)
+            if tag == "IDMoneda":
+                moneda = elem.text
+            elif tag == "Value":
+                value = elem.text
+            elif moneda is not None:
+                # end of a row
+                if value is not None:
+                    result.append((moneda.strip(), value.strip()))
+                moneda = value = None
+        return result
+
+    def getvalue(self, date: dt.datetime, currency: str) -> str:
+        return self._result(
+            "getvalue", TheDate=date.isoformat(), Moneda=escape(currency)
+        )
+
+    def getvalueadv(
+        self, date: dt.datetime, currency: str
+    ) -> tuple[dt.datetime, str, str]:
+        fields = {}
+        for elem in self._call(
+            "getvalueadv", thedate=date.isoformat(), themoneda=escape(currency)
+        ):
+            tag = _local(elem.tag)
+            if tag in ("date", "moneda", "value"):
+                fields[tag] = elem.text or ""
+        return _to_datetime(fields["date"]), fields.get("moneda", ""), fields["value"]
+
+    def lastdateinserted(self) -> dt.datetime:
+        return _to_datetime(self._result("lastdateinserted"))
+
+    def getlatestvalue(self, currency: str) -> str:
+        return self._result("getlatestvalue", Moneda=escape(currency))
+
+    def _result(self, operation: str, **params: str) -> str:
+        result_tag = operation + "Result"
+        for elem in self._call(operation, **params):
+            if _local(elem.tag) == result_tag:
+                return elem.text or ""
+        raise SoapFault(None, f"missing {result_tag} in response")
+
+    def _call(self, operation: str, **params: str):
+        body = _TEMPLATES[operation].format(**params).encode("utf-8")
+        headers = {
+            "Content-Type": "text/xml; charset=utf-8",
+            "SOAPAction": f'"{_NS}{operation}"',
+        }
+
+        response = self._pool.request(
+            self._scheme, self._host, self._port, "POST", self._path, body, headers
+        )
+
+        try:
+            parser = XMLPullParser(events=("end",))
+            parser.feed(response.data)
+            parser.close()
+            events = [elem for _, elem in parser.read_events()]
+        except ParseError:
+            if response.status != 200:
+                raise SoapHTTPError(response.status, response.reason)
+            raise
+
+        fault = next((e for e in events if _local(e.tag) == "Fault"), None)
+        if fault is not None:
+            fields = {_local(child.tag): child.text for child in fault}
+            raise SoapFault(fields.get("faultcode"), fields.get("faultstring"))
+        if response.status != 200:
+            raise SoapHTTPError(response.status, response.reason)
+
+        return events
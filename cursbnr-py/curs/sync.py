@@ -0,0 +1,345 @@
+import hashlib
+import io
+import os
+import re
+from pathlib import Path
+from typing import NamedTuple
+from xml.sax.saxutils import unescape
+
+from curs.db import CursDB
+from curs.types import to_numeric_opt
+from curs.xml import (
+    append_bnr_xml_rates,
+    escape_attr,
+    format_bnr_xml_value,
+    iter_bnr_xml_batches,
+    write_bnr_xml_stream,
+)
+
+__all__ = ("XmlSync", "SyncResult")
+
+# a <currency> start tag, with the indentation before it
+_CURRENCY_START = re.compile(rb"[ \t]*<currency\s+name=(['\"])([^'\"]*)\1\s*>")
+_CURRENCY_END = b"</currency>"
+_VALUES_END = b"</values"
+
+
+class SyncResult(NamedTuple):
+    rows_imported: int  # inserted or replaced in the database
+    rows_exported: int  # appended to or rewritten in the file
+    blocks_read: list[str]  # currencies parsed again from the file
+    blocks_written: list[str]  # currencies patched in the file
+
+
+class _Block(NamedTuple):
+    # what a <currency> block held when it was last synced; the database
+    # had the same rows then, so these also tell what it has added since
+    digest: str
+    row_count: int
+    value_count: int
+    last_date: str | None  # of any row, with or without a value
+
+
+def _digest(block: bytes) -> str:
+    return hashlib.blake2b(block, digest_size=16).hexdigest()
+
+
+def _split_blocks(data: bytes) -> list[tuple[str | None, bytes]]:
+    # the file as (currency, block) and (None, other text) parts, which
+    # join back into the same bytes; the last part starts at </values>
+    parts = []
+    pos = 0
+    while m := _CURRENCY_START.search(data, pos):
+        end = data.find(_CURRENCY_END, m.end())
+        if end < 0:
+            break
+        end += len(_CURRENCY_END)
+        # the block takes its line break, so it can be moved as a whole
+        while data[end : end + 1] in (b" ", b"\t"):
+            end += 1
+        for newline in (b"\r\n", b"\n"):
+            if data.startswith(newline, end):
+                end += len(newline)
+                break
+        if m.start() > pos:
+            parts.append((None, data[pos : m.start()]))
+        name = unescape(m[2].decode("utf-8"), {"&apos;": "'", "&quot;": '"'})
+        parts.append((name, data[m.start() : end]))
+        pos = end
+
+    at = data.rfind(_VALUES_END, pos)
+    if at < 0:
+        raise ValueError("no </values> at the end of the file")
+    if at > pos:
+        parts.append((None, data[pos:at]))
+    parts.append((None, data[at:]))
+    return parts
+
+
+def _read_block(block: bytes) -> list[tuple[str, str, str | None]]:
+    rows = []
+    for batch in iter_bnr_xml_batches(io.BytesIO(b"<values>" + block + b"</values>")):
+        rows += batch
+    return rows
+
+
+class XmlSync:
+    # keeps a bnr.xml file and the database in step: only the <currency>
+    # blocks that changed in the file are read, and only the blocks whose
+    # rows changed in the database are written; the file wins for values
+    # that differ in a changed block, the database everywhere else
+    FILES_TABLE = "CURSBNR_SYNC_FILES"
+    BLOCKS_TABLE = "CURSBNR_SYNC_BLOCKS"
+
+    def __init__(self, db: CursDB, xml_file: str | Path):
+        if db.read_only:
+            raise ValueError("cannot sync with a read-only database")
+        self._db = db
+        self._file = Path(xml_file)
+        self._key = str(self._file.absolute())
+
+        conn = self._db.connection
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.FILES_TABLE}(
+                path TEXT NOT NULL PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL
+            ) WITHOUT ROWID
+            """).close()
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.BLOCKS_TABLE}(
+                path TEXT NOT NULL,
+                currency TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                row_count INTEGER NOT NULL,
+                value_count INTEGER NOT NULL,
+                last_date TEXT NULL,
+                PRIMARY KEY (path, currency)
+            ) WITHOUT ROWID
+            """).close()
+
+    def sync(self, *, full: bool = False) -> SyncResult:
+        # full reads every block again and compares every rate, in case the
+        # state tables are stale; rates changed in place in the database,
+        # without changing its counts, are only written by the next full
+        # export (db2xml.py)
+        blocks = {} if full else self._select_blocks()
+        parts = None
+        rows_imported = 0
+        blocks_read = []
+
+        if not self._file.exists():
+            blocks = {}
+        elif full or self._stat() != self._select_stat():
+            parts = _split_blocks(self._file.read_bytes())
+            for currency, block in parts:
+                if currency is None:
+                    continue
+                digest = _digest(block)
+                state = blocks.get(currency)
+                if state is not None and state.digest == digest:
+                    continue
+                rows = _read_block(block)
+                rows_imported += self._import_rows(currency, rows)
+                blocks[currency] = _Block(
+                    digest,
+                    len(rows),
+                    sum(value is not None for *_, value in rows),
+                    max((date for date, *_ in rows), default=None),
+                )
+                blocks_read.append(currency)
+            # blocks gone from the file are no longer known to be in sync
+            in_file = {currency for currency, _ in parts if currency is not None}
+            blocks = {k: v for k, v in blocks.items() if k in in_file}
+
+        if not self._file.exists():
+            rows_exported, blocks_written = self._write_all(), self._db.get_currencies()
+        else:
+            rows_exported, blocks_written = self._patch(blocks, parts)
+
+        self._db.commit()
+        return SyncResult(rows_imported, rows_exported, blocks_read, blocks_written)
+
+    def _import_rows(self, currency: str, rows: list) -> int:
+        # only rows that are new or really differ: the file keeps 6 digits,
+        # so a rate is unchanged if it reads back as the database's value
+        # or as that value written out, and then keeps its full precision
+        for _, cursor in self._db.iter_currency_rows(currency, iso_dates=True):
+            known = dict(cursor)
+        changed = []
+        for row in rows:
+            date_iso, _, text = row
+            if date_iso not in known:
+                changed.append(row)
+                continue
+            value = known[date_iso]
+            if text is None:
+                # a rate without a value never replaces one with a value
+                continue
+            if text != format_bnr_xml_value(value) and to_numeric_opt(text) != value:
+                changed.append(row)
+        if not changed:
+            return 0
+        return self._db.insert_many_values(changed, replace=True)
+
+    def _patch(
+        self, blocks: dict[str, _Block], parts: list | None
+    ) -> tuple[int, list[str]]:
+        # compare what each block held with the database's counts, which
+        # CURSBNR_CURRENCIES keeps, and its last date, an index lookup
+        db_blocks = {}
+        for stats in self._db.get_currency_stats():
+            last_date = self._fetchone(
+                "SELECT CAST(MAX(date) AS TEXT) FROM CURSBNR WHERE currency = ?",
+                (stats.currency,),
+            )[0]
+            db_blocks[stats.currency] = (stats.row_count, stats.value_count, last_date)
+
+        changed = {
+            currency
+            for currency in blocks.keys() | db_blocks.keys()
+            if currency not in blocks
+            or db_blocks.get(currency) != tuple(blocks[currency][1:])
+        }
+        if not changed:
+            self._save(blocks)
+            return 0, []
+
+        if parts is None:
+            parts = _split_blocks(self._file.read_bytes())
+        newline = "\r\n" if b"\r\n" in parts[0][1][:200] else "\n"
+        names = [currency for currency, _ in parts]
+
+        n_rows = 0
+        for currency in sorted(changed):
+            if currency in names:
+                at = names.index(currency)
+                block = parts[at][1]
+            else:
+                # new blocks go in currency order, as write_bnr_xml has them
+                at = next(
+                    (
+                        k
+                        for k, name in enumerate(names)
+                        if name is not None and name > currency
+                    ),
+                    len(names) - 1,
+                )
+                block = None
+
+            if currency not in db_blocks:
+                # its rows were deleted from the database
+                del parts[at], names[at]
+                blocks.pop(currency, None)
+                continue
+
+            state = blocks.get(currency)
+            lines = []
+            if state is not None and state.last_date is not None:
+                # only added after the last date: append just those rows
+                db_count, db_value_count, _ = db_blocks[currency]
+                added = self._fetchall(
+                    "SELECT CAST(date AS TEXT), value FROM CURSBNR"
+                    " WHERE currency = ? AND date > ? ORDER BY date",
+                    (currency, state.last_date),
+                )
+                close = block.rfind(_CURRENCY_END)
+                line_start = block.rfind(b"\n", 0, close) + 1
+                if (
+                    len(added) == db_count - state.row_count
+                    and sum(value is not None for _, value in added)
+                    == db_value_count - state.value_count
+                    and line_start > 0
+                ):
+                    n_rows += append_bnr_xml_rates(lines.append, added)
+                    text = "".join(lines).replace("\n", newline).encode("utf-8")
+                    block = block[:line_start] + text + block[line_start:]
+                    lines = None
+
+            if lines is not None:
+                # anything else: the block is written again from the database
+                lines.append(f"\t<currency name='{escape_attr(currency)}'>\n")
+                for _, rows in self._db.iter_currency_rows(currency, iso_dates=True):
+                    n_rows += append_bnr_xml_rates(lines.append, rows)
+                lines.append("\t</currency>\n")
+                block = "".join(lines).replace("\n", newline).encode("utf-8")
+
+            if currency in names:
+                parts[at] = currency, block
+            else:
+                parts.insert(at, (currency, block))
+                names.insert(at, currency)
+            blocks[currency] = _Block(_digest(block), *db_blocks[currency])
+
+        # next to the file and then over it, never half written
+        temp_file = self._file.with_name(self._file.name + ".tmp")
+        temp_file.write_bytes(b"".join(block for _, block in parts))
+        os.replace(temp_file, self._file)
+
+        self._save(blocks)
+        return n_rows, sorted(changed)
+
+    def _write_all(self) -> int:
+        n_rows = write_bnr_xml_stream(
+            self._db.iter_currency_rows(iso_dates=True), self._file
+        )
+        blocks = {}
+        for currency, block in _split_blocks(self._file.read_bytes()):
+            if currency is not None:
+                (stats,) = self._db.get_currency_stats(currency)
+                last_date = self._fetchone(
+                    "SELECT CAST(MAX(date) AS TEXT) FROM CURSBNR WHERE currency = ?",
+                    (currency,),
+                )[0]
+                blocks[currency] = _Block(
+                    _digest(block), stats.row_count, stats.value_count, last_date
+                )
+        self._save(blocks)
+        return n_rows
+
+    def _stat(self) -> tuple[int, int]:
+        stat = self._file.stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    def _select_stat(self) -> tuple[int, int] | None:
+        row = self._fetchone(
+            f"SELECT mtime_ns, size FROM {self.FILES_TABLE} WHERE path = ?",
+            (self._key,),
+        )
+        return tuple(row) if row is not None else None
+
+    def _select_blocks(self) -> dict[str, _Block]:
+        rows = self._fetchall(
+            f"SELECT currency, digest, row_count, value_count, last_date"
+            f" FROM {self.BLOCKS_TABLE} WHERE path = ?",
+            (self._key,),
+        )
+        return {currency: _Block(*state) for currency, *state in rows}
+
+    def _save(self, blocks: dict[str, _Block]) -> None:
+        conn = self._db.connection
+        conn.execute(
+            f"DELETE FROM {self.BLOCKS_TABLE} WHERE path = ?", (self._key,)
+        ).close()
+        conn.executemany(
+            f"INSERT INTO {self.BLOCKS_TABLE} VALUES (?, ?, ?, ?, ?, ?)",
+            ((self._key, currency, *state) for currency, state in blocks.items()),
+        ).close()
+        conn.execute(
+            f"INSERT OR REPLACE INTO {self.FILES_TABLE} VALUES (?, ?, ?)",
+            (self._key, *self._stat()),
+        ).close()
+
+    def _fetchone(self, sql: str, params: tuple = ()):
+        cursor = self._db.connection.execute(sql, params)
+        try:
+            return cursor.fetchone()
+        finally:
+            cursor.close()
+
+    def _fetchall(self, sql: str, params: tuple = ()) -> list:
+        cursor = self._db.connection.execute(sql, params)
+        try:
+            return cursor.fetchall()
+        finally:
+            cursor.close()
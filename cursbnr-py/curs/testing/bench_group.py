@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+# Compares per-currency filtering of a row list against the single-pass
+# grouping used by plotqt/plotdb, e.g.
+#     python -m curs.testing.bench_group --days 10000 --currencies 35
+
+import datetime as dt
+import timeit
+from argparse import ArgumentParser
+from decimal import Decimal
+from sys import argv
+
+from curs.types import group_dates_values
+
+CURRENCIES = (
+    "AED AUD BGN BRL CAD CHF CNY CZK DKK EGP EUR GBP HRK HUF INR JPY KRW MDL"
+    " MXN NOK NZD PLN RSD RUB SEK THB TRY UAH USD XAU XDR ZAR ILS PHP RON"
+).split()
+
+
+def synthetic_rows(days: int, currencies: list[str]):
+    start = dt.date(2005, 1, 3)
+    return [
+        (start + dt.timedelta(days=day), currency, Decimal(i + day % 100) / 10)
+        for day in range(days)
+        for i, currency in enumerate(currencies)
+    ]
+
+
+def filter_per_currency(rows, currencies):
+    # what extract_dates_values(rows, currency=c) used to do for each c
+    data = {}
+    for currency in currencies:
+        selected = map(
+            lambda dcv: (dcv[0], dcv[2]),
+            filter(lambda dcv: dcv[1] == currency, rows),
+        )
+        dates, values = list(), list()
+        for date, value in selected:
+            dates.append(date)
+            values.append(value)
+        data[currency] = dates, values
+    return data
+
+
+def main():
+    parser = ArgumentParser(argv[0])
+    parser.add_argument("--days", type=int, default=10000)
+    parser.add_argument("--currencies", type=int, default=len(CURRENCIES))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv[1:])
+
+    currencies = CURRENCIES[: args.currencies]
+    rows = synthetic_rows(args.days, currencies)
+    print(f"{len(rows)} rows, {len(currencies)} currencies")
+
+    assert filter_per_currency(rows, currencies) == group_dates_values(
+        rows, currencies=currencies
+    )
+
+    for name, func in (
+        ("filter", filter_per_currency),
+        (
+            "group",
+            lambda rows, currencies: group_dates_values(rows, currencies=currencies),
+        ),
+    ):
+        best = min(
+            timeit.repeat(lambda: func(rows, currencies), number=1, repeat=args.repeat)
+        )
+        print(f"{name:>8}  {best * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+
+# Runs ws2db.py end-to-end against a local mock server, e.g.
+#     python -m curs.testing.bench_ingest --start-date 2020-01-01 --latency 0.005
+#     python -m curs.testing.bench_ingest --scenario async-bulk -- --concurrency 32
+
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+from sys import argv
+from typing import NamedTuple
+
+from curs.db import CursDB
+from curs.testing.mock_server import MockCursServer, RateTable, synthetic_rates
+from curs.types import Date, to_date
+
+WS2DB = Path(__file__).resolve().parent.parent.parent / "ws2db.py"
+
+SCENARIOS: dict[str, list[str]] = {
+    "threads": [],
+    "bulk": ["--bulk"],
+    "async": ["--engine", "async"],
+    "async-bulk": ["--engine", "async", "--bulk"],
+    "suds": ["--transport", "suds"],
+}
+
+
+class BenchResult(NamedTuple):
+    scenario: str
+    elapsed: float
+    requests: int
+    rows: int
+    p50: float
+    p99: float
+    peak_rss: int  # bytes
+
+    def __str__(self):
+        return (
+            f"{self.scenario:>12}  {self.elapsed:7.2f}s"
+            f"  {self.requests:7d} req {self.requests / self.elapsed:8.1f} req/s"
+            f"  {self.rows:7d} rows {self.rows / self.elapsed:8.1f} rows/s"
+            f"  p50 {self.p50 * 1000:6.2f} ms  p99 {self.p99 * 1000:6.2f} ms"
+            f"  RSS {self.peak_rss / 2**20:6.1f} MiB"
+        )
+
+
+def run_scenario(
+    server: MockCursServer,
+    scenario: str,
+    args: list[str],
+    *,
+    start_date: Date,
+    workdir: Path,
+) -> BenchResult:
+    db_file = workdir / f"{scenario}.db"
+    log_file = workdir / f"{scenario}.log"
+    seen = len(server.latencies)
+
+    command = [sys.executable, str(WS2DB), "--db", str(db_file), "--url", server.url]
+    command += ["--start-date", start_date.isoformat(), *args]
+
+    start = time.perf_counter()
+    with open(log_file, "w") as log:
+        proc = subprocess.Popen(command, stdout=log, stderr=subprocess.DEVNULL)
+        _, status, rusage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+
+    if proc.returncode != 0:
+        raise RuntimeError(f"{scenario}: ws2db failed, see {log_file!s}")
+
+    latencies = server.latencies[seen:]
+    quantiles = (
+        statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+    )
+
+    db = CursDB(db_file, mode="ro")
+    try:
+        rows = len(db.select_rows(value_is_null=None))
+    finally:
+        db.close()
+
+    return BenchResult(
+        scenario,
+        elapsed,
+        len(latencies),
+        rows,
+        quantiles[49],
+        quantiles[98],
+        rusage.ru_maxrss * 1024,  # KiB on Linux
+    )
+
+
+def main():
+    arg_parser = ArgumentParser()
+    arg_parser.add_argument(
+        "--start-date", metavar="YYYY-MM-DD", type=to_date, default="2015-01-01"
+    )
+    arg_parser.add_argument(
+        "--end-date", metavar="YYYY-MM-DD", type=to_date, default="2024-12-31"
+    )
+    arg_parser.add_argument(
+        "--xml", metavar="XML", type=str, help="serve rates from this file"
+    )
+    arg_parser.add_argument("--latency", metavar="SECONDS", type=float, default=0.0)
+    arg_parser.add_argument("--jitter", metavar="SECONDS", type=float, default=0.0)
+    arg_parser.add_argument("--fault-rate", metavar="P", type=float, default=0.0)
+    arg_parser.add_argument(
+        "--scenario",
+        choices=sorted(SCENARIOS.keys()),
+        action="append",
+        help="scenarios to run, all but suds by default",
+    )
+    arg_parser.add_argument(
+        "extra", nargs="*", help="extra ws2db arguments, after --", default=[]
+    )
+    args = arg_parser.parse_args(argv[1:])
+
+    if args.xml is not None:
+        rates = RateTable.from_xml(args.xml)
+    else:
+        rates = RateTable(synthetic_rates(args.start_date, args.end_date))
+
+    server = MockCursServer(
+        rates, latency=args.latency, jitter=args.jitter, fault_rate=args.fault_rate
+    ).start()
+
+    scenarios = args.scenario or [s for s in SCENARIOS.keys() if s != "suds"]
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            for scenario in scenarios:
+                result = run_scenario(
+                    server,
+                    scenario,
+                    SCENARIOS[scenario] + args.extra,
+                    start_date=args.start_date,
+                    workdir=Path(workdir),
+                )
+                print(result, flush=True)
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
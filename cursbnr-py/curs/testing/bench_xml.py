@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+# Times the SAX and pyexpat bnr.xml readers on a synthetic cache file, e.g.
+#     python -m curs.testing.bench_xml --years 25 --currencies 40
+#     python -m curs.testing.bench_xml --xml bnr.xml
+
+import datetime as dt
+import random
+import tempfile
+import timeit
+from argparse import ArgumentParser
+from pathlib import Path
+from sys import argv
+
+from curs.types import CursMap
+from curs.xml import iter_bnr_xml_batches, parse_bnr_xml, write_bnr_xml
+
+
+def synthetic_map(years: int, n_currencies: int, seed: int = 0) -> CursMap:
+    rng = random.Random(seed)
+    map = CursMap()
+    start = dt.date(2000, 1, 3)
+    currencies = [f"C{k:02d}" for k in range(n_currencies)]
+    for day in range(int(years * 365.25)):
+        date = start + dt.timedelta(days=day)
+        for currency in currencies:
+            if date.weekday() >= 5:
+                map.put_value(date, currency, None)
+            else:
+                map.put_value(date, currency, round(rng.uniform(0.01, 500), 4))
+    return map
+
+
+def count_rows(xml_file: Path, parser: str) -> int:
+    return sum(map(len, iter_bnr_xml_batches(xml_file, parser=parser)))
+
+
+def main():
+    parser = ArgumentParser(argv[0])
+    parser.add_argument("--xml", type=Path, default=None, help="existing file")
+    parser.add_argument("--years", type=int, default=25)
+    parser.add_argument("--currencies", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv[1:])
+
+    with tempfile.TemporaryDirectory() as workdir:
+        xml_file = args.xml
+        if xml_file is None:
+            xml_file = Path(workdir) / "bnr.xml"
+            write_bnr_xml(synthetic_map(args.years, args.currencies), xml_file)
+        print(f"{xml_file}: {xml_file.stat().st_size / 2**20:.1f} MiB")
+
+        assert parse_bnr_xml(xml_file, parser="sax") == parse_bnr_xml(
+            xml_file, parser="expat"
+        )
+        n_rows = count_rows(xml_file, "expat")
+        assert n_rows == count_rows(xml_file, "sax")
+
+        for name, func in (
+            ("CursMap sax", lambda: parse_bnr_xml(xml_file, parser="sax")),
+            ("CursMap expat", lambda: parse_bnr_xml(xml_file, parser="expat")),
+            ("rows sax", lambda: count_rows(xml_file, "sax")),
+            ("rows expat", lambda: count_rows(xml_file, "expat")),
+        ):
+            best = min(timeit.repeat(func, number=1, repeat=args.repeat))
+            print(
+                f"{name:>14}  {best * 1000:8.1f} ms  {n_rows / best / 1e6:6.2f} M rows/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
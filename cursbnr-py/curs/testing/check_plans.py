@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+# Runs CursDB's currency-first lookups against a synthetic database and
+# fails if EXPLAIN QUERY PLAN shows any of them scanning all of CURSBNR, e.g.
+#     python -m curs.testing.check_plans --days 2000 --verbose
+
+import datetime as dt
+import re
+import sys
+import tempfile
+from argparse import ArgumentParser
+from pathlib import Path
+from sys import argv
+from typing import Callable
+
+from curs.db import CursDB
+
+# a plain SCAN of the main table, as opposed to SEARCH or SCAN CURSBNR_...
+FULL_SCAN = re.compile(r"^SCAN CURSBNR\b(?!_)")
+
+CURRENCIES = ["EUR", "USD", "GBP", "CHF", "JPY", "XAU"]
+
+
+def checks(db: CursDB, day: dt.date) -> list[tuple[str, Callable[[], object]]]:
+    week_ago = day - dt.timedelta(days=7)
+    return [
+        ("value", lambda: db.value(day, "EUR")),
+        ("get_value", lambda: db.get_value(day, "EUR")),
+        ("get_date_range(currency)", lambda: db.get_date_range("USD")),
+        ("get_date_range()", lambda: db.get_date_range()),
+        ("get_currencies", lambda: db.get_currencies()),
+        ("get_currency_stats", lambda: db.get_currency_stats(["EUR", "USD"])),
+        (
+            "select_value_rows(currency=[...])",
+            lambda: db.select_value_rows(date=(week_ago, day), currency=["EUR", "USD"]),
+        ),
+        (
+            "select_series(currency)",
+            lambda: db.select_series("GBP", date=(week_ago, day)),
+        ),
+        (
+            "delete trigger edge lookup",
+            lambda: db.connection.execute(
+                "SELECT MIN(date) FROM CURSBNR"
+                " WHERE currency = 'EUR' AND value IS NOT NULL"
+            ).fetchall(),
+        ),
+    ]
+
+
+def query_plans(db: CursDB, func: Callable[[], object]) -> list[tuple[str, list]]:
+    statements = []
+    conn = db.connection
+    conn.set_trace_callback(statements.append)
+    try:
+        func()
+    finally:
+        conn.set_trace_callback(None)
+
+    plans = []
+    for sql in statements:
+        if not sql.lstrip().upper().startswith("SELECT"):
+            continue
+        rows = conn.execute("EXPLAIN QUERY PLAN " + sql).fetchall()
+        plans.append((sql, [detail for *_, detail in rows]))
+    return plans
+
+
+def main():
+    parser = ArgumentParser(argv[0])
+    parser.add_argument("--days", type=int, default=2000)
+    parser.add_argument("--verbose", "-v", action="store_true")
+    args = parser.parse_args(argv[1:])
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db = CursDB(Path(workdir) / "plans.db", mode="rwc")
+        end = dt.date(2024, 12, 31)
+        db.put_rows(
+            (end - dt.timedelta(days=n), currency, None if n % 7 == 0 else 4.5 + n)
+            for n in range(args.days)
+            for currency in CURRENCIES
+        )
+        db.commit()
+        db.connection.execute("ANALYZE")
+
+        failed = 0
+        for name, func in checks(db, end - dt.timedelta(days=args.days // 2)):
+            for sql, details in query_plans(db, func):
+                scans = [detail for detail in details if FULL_SCAN.match(detail)]
+                if scans or args.verbose:
+                    print(f"{'FAIL' if scans else 'ok':>4}  {name}")
+                    print("      " + " ".join(sql.split()))
+                    for detail in details:
+                        print("        " + detail)
+                failed += bool(scans)
+
+        db.close()
+
+    if failed:
+        print(f"{failed} queries scan CURSBNR", file=sys.stderr)
+        sys.exit(1)
+    print("all queries use an index")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+# Round-trips a synthetic database through bnr.xml with XmlSync and fails
+# if a sync changes anything it should not, e.g.
+#     python -m curs.testing.check_sync --days 400
+
+import datetime as dt
+import sys
+import tempfile
+from argparse import ArgumentParser
+from pathlib import Path
+from sys import argv
+
+from curs.db import CursDB
+from curs.sync import XmlSync
+from curs.xml import write_bnr_xml_stream
+
+CURRENCIES = ["EUR", "JPY", "USD", "XAU"]
+
+# more digits than the file keeps, and whole numbers stored as integers
+VALUES = {"EUR": 4.97654321, "JPY": 3.0, "USD": 4.5, "XAU": 312.4567}
+
+
+def db_rows(db: CursDB) -> list[tuple]:
+    return db.connection.execute(
+        "SELECT date, currency, value, typeof(value) FROM CURSBNR"
+        " ORDER BY currency, date"
+    ).fetchall()
+
+
+def export(db: CursDB, xml_file: Path) -> bytes:
+    write_bnr_xml_stream(db.iter_currency_rows(iso_dates=True), xml_file)
+    return xml_file.read_bytes()
+
+
+def main():
+    parser = ArgumentParser(argv[0])
+    parser.add_argument("--days", type=int, default=400)
+    args = parser.parse_args(argv[1:])
+
+    failed = []
+
+    def check(name: str, ok: bool) -> None:
+        print(f"{'ok' if ok else 'FAIL':>4}  {name}")
+        if not ok:
+            failed.append(name)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db = CursDB(Path(workdir) / "sync.db", mode="rwc")
+        end = dt.date(2024, 12, 31)
+        db.put_rows(
+            (
+                end - dt.timedelta(days=n),
+                currency,
+                None if n % 7 == 0 else VALUES[currency] + n / 1000,
+            )
+            for n in range(args.days)
+            for currency in CURRENCIES
+        )
+        db.commit()
+
+        # db2xml, then the first sync: nothing to import, nothing rounded
+        xml_file = Path(workdir) / "bnr.xml"
+        export(db, xml_file)
+        before = db_rows(db)
+        result = XmlSync(db, xml_file).sync()
+        check("first sync imports nothing", result.rows_imported == 0)
+        check("first sync leaves the database unchanged", db_rows(db) == before)
+        check("first sync leaves the file unchanged", result.blocks_written == [])
+
+        # a new day in the database is appended to the file
+        day = end + dt.timedelta(days=1)
+        db.put_rows([(day, "XAU", 313.98765), (day, "RON", 1)])
+        db.commit()
+        before = db_rows(db)
+        result = XmlSync(db, xml_file).sync()
+        check(
+            "daily sync writes only its blocks", result.blocks_written == ["RON", "XAU"]
+        )
+        check("daily sync leaves the database unchanged", db_rows(db) == before)
+        check(
+            "daily sync writes what db2xml does",
+            xml_file.read_bytes() == export(db, Path(workdir) / "full.xml"),
+        )
+
+        # a rate edited in the file is imported, the rest keep their digits
+        data = xml_file.read_bytes()
+        edited = data.replace(
+            f"<rate date='{day}' value='313.988' />".encode(),
+            f"<rate date='{day}' value='320.5' />".encode(),
+        )
+        check("file edit applies", edited != data)
+        xml_file.write_bytes(edited)
+        result = XmlSync(db, xml_file).sync()
+        check("file edit imports one rate", result.rows_imported == 1)
+        after = {(d, c): v for d, c, v, _ in db_rows(db)}
+        check("file edit is in the database", after[(day, "XAU")] == 320.5)
+        check(
+            "file edit keeps other digits",
+            after[(end - dt.timedelta(days=1), "XAU")] == VALUES["XAU"] + 1 / 1000,
+        )
+
+        # a full sync reads every block again, still without rounding
+        before = db_rows(db)
+        result = XmlSync(db, xml_file).sync(full=True)
+        check("full sync imports nothing", result.rows_imported == 0)
+        check("full sync leaves the database unchanged", db_rows(db) == before)
+
+        db.close()
+
+    if failed:
+        print(f"{len(failed)} checks failed", file=sys.stderr)
+        sys.exit(1)
+    print("all checks passed")
+
+
+if __name__ == "__main__":
+    main()
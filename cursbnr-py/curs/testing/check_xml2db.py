@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+# Imports synthetic bnr.xml snapshots with xml2db.py and fails if the
+# database differs from merging them in memory, or if peak memory grows
+# with the number of files, e.g.
+#     python -m curs.testing.check_xml2db --years 25 --files 6 --jobs 2
+
+import re
+import subprocess
+import sys
+import tempfile
+from argparse import ArgumentParser
+from pathlib import Path
+from sys import argv
+
+import numpy as np
+
+from curs.db import CursDB
+from curs.ingest import merge_row_arrays, read_bnr_xml_arrays
+from curs.testing.bench_xml import synthetic_map
+from curs.xml import write_bnr_xml
+
+XML2DB = Path(__file__).resolve().parent.parent.parent / "xml2db.py"
+
+
+# runs a script as __main__, then prints its peak RSS; unlike ru_maxrss,
+# VmHWM starts over at exec instead of at the parent's peak
+_RUN_MEASURED = """
+import runpy, sys
+sys.argv = sys.argv[1:]
+runpy.run_path(sys.argv[0], run_name="__main__")
+with open("/proc/self/status") as status:
+    sys.stderr.write("".join(line for line in status if line.startswith("VmHWM:")))
+"""
+
+
+def run_xml2db(db_file: Path, xml_files: list[Path], *args: str) -> int:
+    # peak RSS in bytes of the importing process, not counting workers
+    command = [sys.executable, "-c", _RUN_MEASURED, str(XML2DB), "--db", str(db_file)]
+    command += [*args, *(str(xml_file) for xml_file in xml_files)]
+    proc = subprocess.run(
+        command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    found = re.findall(r"^VmHWM:\s+(\d+) kB", proc.stderr, re.MULTILINE)
+    if proc.returncode != 0 or not found:
+        raise RuntimeError(f"xml2db failed: {' '.join(command)}")
+    return int(found[-1]) * 1024
+
+
+def db_rows(db_file: Path) -> list[tuple]:
+    db = CursDB(db_file, mode="ro")
+    try:
+        return db.connection.execute(
+            "SELECT CAST(date AS TEXT), currency, value FROM CURSBNR"
+            " ORDER BY currency, date"
+        ).fetchall()
+    finally:
+        db.close()
+
+
+def expected_rows(xml_files: list[Path]) -> list[tuple]:
+    merged, _ = merge_row_arrays([read_bnr_xml_arrays(f) for f in xml_files])
+    values = [None if np.isnan(value) else value for value in merged.values]
+    return [
+        (str(date), merged.currencies[code], value)
+        for code, date, value in zip(merged.codes, merged.dates, values)
+    ]
+
+
+def main():
+    parser = ArgumentParser(argv[0])
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--currencies", type=int, default=40)
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--jobs", type=int, default=2)
+    parser.add_argument(
+        "--max-growth",
+        metavar="MIB",
+        type=float,
+        default=4.0,
+        help="allowed peak RSS growth from 2 files to all of them",
+    )
+    args = parser.parse_args(argv[1:])
+
+    failed = []
+
+    def check(name: str, ok: bool) -> None:
+        print(f"{'ok' if ok else 'FAIL':>4}  {name}")
+        if not ok:
+            failed.append(name)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        workdir = Path(workdir)
+        # the same days and currencies, other values: every row conflicts
+        xml_files = []
+        for k in range(args.files):
+            xml_file = workdir / f"bnr-{k}.xml"
+            write_bnr_xml(synthetic_map(args.years, args.currencies, k), xml_file)
+            xml_files.append(xml_file)
+
+        rss_one = run_xml2db(workdir / "one.db", xml_files[:1])
+        check(
+            "one file imports every row",
+            db_rows(workdir / "one.db") == expected_rows(xml_files[:1]),
+        )
+
+        # every rate twice in one file, as when two snapshots are pasted
+        # together: the later rows win within a file too
+        joined = workdir / "joined.xml"
+        head = xml_files[0].read_bytes().rpartition(b"</values>")[0]
+        tail = xml_files[1].read_bytes().partition(b"<values>")[2]
+        joined.write_bytes(head + tail)
+        run_xml2db(workdir / "joined.db", [joined])
+        check(
+            "later rows in one file win conflicts",
+            db_rows(workdir / "joined.db") == expected_rows(xml_files[:2]),
+        )
+
+        # both in one process, so the peaks compare
+        rss_two = run_xml2db(workdir / "two.db", xml_files[:2], "--jobs", "1")
+        rss_all = run_xml2db(workdir / "all.db", xml_files, "--jobs", "1")
+        check(
+            "later files win conflicts",
+            db_rows(workdir / "all.db") == expected_rows(xml_files),
+        )
+        rss_pool = run_xml2db(workdir / "pool.db", xml_files, "--jobs", str(args.jobs))
+        check(
+            "parsing in worker processes gives the same rows",
+            db_rows(workdir / "pool.db") == db_rows(workdir / "all.db"),
+        )
+
+        for name, rss in (
+            ("1 file", rss_one),
+            ("2 files", rss_two),
+            (f"{args.files} files", rss_all),
+            (f"{args.files} files, {args.jobs} jobs, without workers", rss_pool),
+        ):
+            print(f"      {name}: peak RSS {rss / 2**20:.1f} MiB")
+        growth = (rss_all - rss_two) / 2**20
+        check(
+            f"peak RSS grows {growth:+.1f} MiB from 2 to {args.files} files"
+            f" (at most {args.max_growth:g})",
+            growth <= args.max_growth,
+        )
+
+    if failed:
+        print(f"{len(failed)} checks failed", file=sys.stderr)
+        sys.exit(1)
+    print("all checks passed")
+
+
+if __name__ == "__main__":
+    main()
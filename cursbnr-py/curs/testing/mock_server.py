@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+
+import bisect
+import datetime as dt
+import random
+import re
+import threading
+import time
+from argparse import ArgumentParser
+from collections.abc import Iterable, Mapping
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from sys import argv
+from xml.sax.saxutils import escape
+
+from curs.types import CursMap, Date, Numeric, to_date
+
+__all__ = ("MockCursServer", "RateTable", "synthetic_rates")
+
+_WSDL = Path(__file__).resolve().parent.parent / "curs.wsdl"
+
+_ENVELOPE = (
+    '<?xml version="1.0" encoding="utf-8"?>'
+    '<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"'
+    ' xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"'
+    ' xmlns:xsd="http://www.w3.org/2001/XMLSchema">'
+    "<soap:Body>{body}</soap:Body></soap:Envelope>"
+)
+
+_GETALL = (
+    '<getallResponse xmlns="http://www.infovalutar.ro/"><getallResult>'
+    '<xs:schema id="NewDataSet" xmlns="" xmlns:xs="http://www.w3.org/2001/XMLSchema"'
+    ' xmlns:msdata="urn:schemas-microsoft-com:xml-msdata">'
+    '<xs:element name="NewDataSet" msdata:IsDataSet="true"><xs:complexType>'
+    '<xs:choice minOccurs="0" maxOccurs="unbounded"><xs:element name="Currency">'
+    '<xs:complexType><xs:sequence><xs:element name="IDMoneda" type="xs:string"'
+    ' minOccurs="0" /><xs:element name="Value" type="xs:double" minOccurs="0" />'
+    "</xs:sequence></xs:complexType></xs:element></xs:choice></xs:complexType>"
+    "</xs:element></xs:schema>"
+    '<diffgr:diffgram xmlns:msdata="urn:schemas-microsoft-com:xml-msdata"'
+    ' xmlns:diffgr="urn:schemas-microsoft-com:xml-diffgram-v1">'
+    '<DocumentElement xmlns="">{rows}</DocumentElement></diffgr:diffgram>'
+    "</getallResult></getallResponse>"
+)
+
+_GETALL_ROW = (
+    '<Currency diffgr:id="Currency{n}" msdata:rowOrder="{i}">'
+    "<IDMoneda>{currency}</IDMoneda><Value>{value}</Value></Currency>"
+)
+
+_NULL_REFERENCE = (
+    "Server was unable to process request. ---> "
+    "Object reference not set to an instance of an object."
+)
+
+
+class RateTable:
+    def __init__(self, rates: Mapping[str, Mapping[Date, Numeric | None]]):
+        # currency -> (sorted ordinals, values), NULL entries dropped
+        self._series: dict[str, tuple[list[int], list[Numeric]]] = {}
+        for currency, values in rates.items():
+            items = sorted(
+                (date.toordinal(), value)
+                for date, value in values.items()
+                if value is not None
+            )
+            if items:
+                self._series[currency] = (
+                    [ordinal for ordinal, _ in items],
+                    [value for _, value in items],
+                )
+
+        last = max((days[-1] for days, _ in self._series.values()), default=None)
+        self.lastdate = Date.fromordinal(last) if last is not None else Date.today()
+
+    @classmethod
+    def from_xml(cls, file) -> "RateTable":
+        from curs.xml import parse_bnr_xml
+
+        return cls(parse_bnr_xml(file))
+
+    @property
+    def currencies(self) -> list[str]:
+        return sorted(self._series.keys())
+
+    def value_asof(self, date: Date, currency: str) -> tuple[Date, Numeric] | None:
+        series = self._series.get(currency, None)
+        if series is None:
+            return None
+        days, values = series
+        i = bisect.bisect_right(days, date.toordinal()) - 1
+        if i < 0:
+            return None
+        return Date.fromordinal(days[i]), values[i]
+
+    def all_asof(self, date: Date) -> list[tuple[str, Numeric]]:
+        result = []
+        for currency in self.currencies:
+            found = self.value_asof(date, currency)
+            if found is not None:
+                result.append((currency, found[1]))
+        return result
+
+
+def synthetic_rates(
+    start_date: Date,
+    end_date: Date,
+    currencies: Iterable[str] = ("EUR", "USD", "GBP", "CHF", "HUF", "JPY", "XAU"),
+    *,
+    seed: int = 0,
+) -> CursMap:
+    # a random walk per currency, nothing on weekends, Jan 1 and Dec 25
+    rng = random.Random(seed)
+    rates = CursMap()
+    for currency in currencies:
+        value = rng.uniform(0.5, 5.0)
+        date = start_date
+        while date <= end_date:
+            if date.weekday() < 5 and (date.month, date.day) not in ((1, 1), (12, 25)):
+                value *= 1 + rng.gauss(0, 0.004)
+                rates.put_value(date, currency, round(value, 4))
+            date += dt.timedelta(days=1)
+    return rates
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body are two writes, see Nagle vs. delayed ACK
+    disable_nagle_algorithm = True
+    server: "MockCursServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.lower().endswith("?wsdl"):
+            self._reply(200, self.server.wsdl, "text/xml; charset=utf-8")
+        else:
+            self._reply(404, b"not found", "text/plain")
+
+    def do_POST(self):
+        start = time.perf_counter()
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length).decode("utf-8")
+        operation = self.headers.get("SOAPAction", "").strip('"').rpartition("/")[2]
+
+        server = self.server
+        server.delay()
+
+        if server.inject_fault():
+            self._reply(503, b"Service Unavailable", "text/plain")
+        else:
+            status, response = server.dispatch(operation, body)
+            self._reply(status, response, "text/xml; charset=utf-8")
+
+        server.record(time.perf_counter() - start)
+
+    def _reply(self, status: int, data: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class MockCursServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        rates: RateTable,
+        address: tuple[str, int] = ("127.0.0.1", 0),
+        *,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        fault_rate: float = 0.0,
+        seed: int | None = None,
+    ):
+        super().__init__(address, _Handler)
+        self.rates = rates
+        self.latency = latency
+        self.jitter = jitter
+        self.fault_rate = fault_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._latencies: list[float] = []
+        self._thread: threading.Thread | None = None
+
+        self.wsdl = re.sub(
+            r'location="[^"]*"',
+            f'location="{self.url}"',
+            _WSDL.read_text(encoding="utf-8"),
+        ).encode("utf-8")
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/curs.asmx"
+
+    @property
+    def latencies(self) -> list[float]:
+        with self._lock:
+            return list(self._latencies)
+
+    def start(self) -> "MockCursServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def delay(self) -> None:
+        if self.latency or self.jitter:
+            with self._lock:
+                delay = self.latency + self._rng.uniform(-self.jitter, self.jitter)
+            time.sleep(max(delay, 0.0))
+
+    def inject_fault(self) -> bool:
+        if not self.fault_rate:
+            return False
+        with self._lock:
+            return self._rng.random() < self.fault_rate
+
+    def record(self, latency: float) -> None:
+        with self._lock:
+            self._latencies.append(latency)
+
+    def dispatch(self, operation: str, body: str) -> tuple[int, bytes]:
+        def param(name: str) -> str:
+            found = re.search(rf"<(?:\w+:)?{name}>([^<]*)</", body)
+            return found.group(1) if found else ""
+
+        def param_date(name: str) -> Date:
+            return to_date(dt.datetime.fromisoformat(param(name)))
+
+        def result(tag: str, text: str) -> tuple[int, bytes]:
+            return 200, _ENVELOPE.format(
+                body=f'<{tag}Response xmlns="http://www.infovalutar.ro/">'
+                f"<{tag}Result>{text}</{tag}Result></{tag}Response>"
+            ).encode("utf-8")
+
+        rates = self.rates
+        match operation:
+            case "lastdateinserted" | "LastDateInserted":
+                return result(operation, f"{rates.lastdate.isoformat()}T00:00:00")
+
+            case "getall":
+                rows = "".join(
+                    _GETALL_ROW.format(
+                        n=i + 1, i=i, currency=escape(currency), value=value
+                    )
+                    for i, (currency, value) in enumerate(
+                        rates.all_asof(param_date("dt"))
+                    )
+                )
+                return 200, _ENVELOPE.format(body=_GETALL.format(rows=rows)).encode(
+                    "utf-8"
+                )
+
+            case "getvalueadv":
+                found = rates.value_asof(param_date("thedate"), param("themoneda"))
+                if found is None:
+                    return self._fault(_NULL_REFERENCE)
+                date, value = found
+                return result(
+                    "getvalueadv",
+                    f"<date>{date.isoformat()}T00:00:00</date><value>{value}</value>"
+                    f"<moneda>{escape(param('themoneda'))}</moneda>",
+                )
+
+            case "getvalue" | "GetValue":
+                found = rates.value_asof(param_date("TheDate"), param("Moneda"))
+                return result(operation, str(found[1] if found is not None else 0))
+
+            case "getlatestvalue" | "GetLatestValue":
+                found = rates.value_asof(rates.lastdate, param("Moneda"))
+                return result(operation, str(found[1] if found is not None else 0))
+
+        return self._fault(f"Unknown operation {operation!r}")
+
+    @staticmethod
+    def _fault(message: str) -> tuple[int, bytes]:
+        return 500, _ENVELOPE.format(
+            body="<soap:Fault><faultcode>soap:Server</faultcode>"
+            f"<faultstring>{escape(message)}</faultstring><detail /></soap:Fault>"
+        ).encode("utf-8")
+
+
+def main():
+    arg_parser = ArgumentParser()
+    arg_parser.add_argument("--host", type=str, default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=8080)
+    arg_parser.add_argument(
+        "--xml", metavar="XML", type=str, help="serve rates from this file"
+    )
+    arg_parser.add_argument(
+        "--start-date", metavar="YYYY-MM-DD", type=to_date, default="1998-01-01"
+    )
+    arg_parser.add_argument(
+        "--end-date", metavar="YYYY-MM-DD", type=to_date, default=Date.today()
+    )
+    arg_parser.add_argument("--latency", metavar="SECONDS", type=float, default=0.0)
+    arg_parser.add_argument("--jitter", metavar="SECONDS", type=float, default=0.0)
+    arg_parser.add_argument("--fault-rate", metavar="P", type=float, default=0.0)
+    args = arg_parser.parse_args(argv[1:])
+
+    if args.xml is not None:
+        rates = RateTable.from_xml(args.xml)
+    else:
+        rates = RateTable(synthetic_rates(args.start_date, args.end_date))
+
+    server = MockCursServer(
+        rates,
+        (args.host, args.port),
+        latency=args.latency,
+        jitter=args.jitter,
+        fault_rate=args.fault_rate,
+    )
+    print(f"Serving {len(rates.currencies)} currencies at {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,10 @@
 import datetime as dt
-from typing import Iterable, List, Tuple, Type, TypeVar
+from typing import Dict, Iterable, List, Tuple, Type, TypeVar
 
 from typing import NamedTuple
 
+import numpy as np
+
 _DateT = str | dt.date | dt.datetime
 _NumT = str | int | float
 
@@ -18,6 +20,49 @@ DateCurrencyOptValueRow = NamedTuple(
     "DateCurrencyOptValueRow", date=Date, currency=str, value=Numeric | None
 )
 
+CurrencyStats = NamedTuple(
+    "CurrencyStats",
+    currency=str,
+    first_date=Date | None,
+    last_date=Date | None,
+    row_count=int,
+    value_count=int,
+)
+
+# dates as datetime64[D], values as float64
+Series = NamedTuple("Series", dates=np.ndarray, values=np.ndarray)
+SeriesMatrix = NamedTuple(
+    "SeriesMatrix", dates=np.ndarray, currencies=list[str], values=np.ndarray
+)
+
+# one row per week/month/year (or day), dated by the first day of the period
+Ohlc = NamedTuple(
+    "Ohlc",
+    dates=np.ndarray,
+    open=np.ndarray,
+    high=np.ndarray,
+    low=np.ndarray,
+    close=np.ndarray,
+    mean=np.ndarray,
+    count=np.ndarray,
+)
+
+
+def series_matrix(series: Dict[str, Series]) -> SeriesMatrix:
+    # one row per date any of them has, NaN where a currency has no value
+    currencies = sorted(series.keys())
+    if series:
+        dates = np.unique(np.concatenate([s.dates for s in series.values()]))
+    else:
+        dates = np.array([], dtype="datetime64[D]")
+
+    values = np.full((len(dates), len(currencies)), np.nan)
+    for column, name in enumerate(currencies):
+        rows = np.searchsorted(dates, series[name].dates)
+        values[rows, column] = series[name].values
+
+    return SeriesMatrix(dates, currencies, values)
+
 
 def to_date_opt(date: _DateT | None) -> Date | None:
     if date is None or date == "":
@@ -83,18 +128,42 @@ def extract_dates_values(
     rows: Iterable[DateCurrencyOptValueRow], /, *, currency: str
 ) -> Tuple[List[Date], List[Numeric]]:
     if currency is not None:
-        rows = filter(lambda dcv: dcv[1] == currency, rows)
-
-    rows = map(lambda dcv: (dcv[0], dcv[2]), rows)
+        return group_dates_values(rows, currencies=(currency,)).get(currency, ([], []))
 
     dates, values = list(), list()
-    for date, value in rows:
+    for date, _, value in rows:
         dates.append(date)
         values.append(value)
 
     return dates, values
 
 
+def group_dates_values(
+    rows: Iterable[DateCurrencyOptValueRow],
+    /,
+    *,
+    currencies: Iterable[str] | None = None,
+) -> Dict[str, Tuple[List[Date], List[Numeric]]]:
+    # one pass over the rows, whatever their order; each currency keeps
+    # the order in which its rows came
+    if currencies is not None:
+        groups = {currency: ([], []) for currency in currencies}
+    else:
+        groups = {}
+
+    get = groups.get
+    for date, currency, value in rows:
+        group = get(currency)
+        if group is None:
+            if currencies is not None:
+                continue
+            group = groups[currency] = ([], [])
+        group[0].append(date)
+        group[1].append(value)
+
+    return groups
+
+
 class CursMap(dict):
     def __init__(self):
         pass
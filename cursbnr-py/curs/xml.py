@@ -1,9 +1,13 @@
+from xml.parsers import expat
 from xml.sax.handler import ContentHandler
-from xml.sax import parse as xml_parse
+from xml.sax import make_parser, parse as xml_parse
 from xml.sax.saxutils import escape
-from curs.types import CursMap
+from curs.types import CursMap, Numeric
 
 import datetime as dt
+from itertools import islice
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterable, Iterator, Literal
 
 
 def escape_attr(data):
@@ -45,12 +49,240 @@ class _BnrXmlHandler(ContentHandler):
     pass
 
 
-def parse_bnr_xml(file) -> CursMap:
+class _BnrXmlRowsHandler(ContentHandler):
+    # same walk as _BnrXmlHandler, but only collects the raw attribute
+    # strings; CursDB.insert_many_values converts them
+    def __init__(self) -> None:
+        super().__init__()
+        self.rows = []
+        self._stack = []
+        self._currency = None
+
+    def startElement(self, name, attrs):
+        stack = self._stack
+        stack.append(name)
+
+        if stack == ["values", "currency"]:
+            self._currency = attrs["name"]
+
+        elif stack == ["values", "currency", "rate"]:
+            self.rows.append((attrs["date"], self._currency, attrs.get("value", None)))
+
+    def endElement(self, name):
+        stack = self._stack
+        if stack == ["values", "currency"]:
+            self._currency = None
+
+        stack.pop()
+
+
+class _SaxRowReader:
+    def __init__(self) -> None:
+        self._handler = _BnrXmlRowsHandler()
+        self._parser = make_parser()
+        self._parser.setContentHandler(self._handler)
+
+    @property
+    def n_rows(self) -> int:
+        return len(self._handler.rows)
+
+    def take_rows(self) -> list[tuple[str, str, str | None]]:
+        rows, self._handler.rows = self._handler.rows, []
+        return rows
+
+    def feed(self, data: bytes) -> None:
+        self._parser.feed(data)
+
+    def close(self) -> None:
+        self._parser.close()
+
+
+class _ExpatRowReader:
+    # the same rows as _SaxRowReader, straight from pyexpat: no SAX
+    # attribute objects, and an element depth instead of a tag stack
+    def __init__(self) -> None:
+        self._rows = []
+        parser = self._parser = expat.ParserCreate()
+        parser.buffer_text = True
+        # attributes as a flat [name, value, ...] list, no dict per element
+        parser.ordered_attributes = True
+
+        depth = 0
+        in_values = False
+        currency = None
+        append = self._rows.append
+
+        def start(name, attrs):
+            nonlocal depth, in_values, currency
+            depth += 1
+            if depth == 3:
+                if currency is not None and name == "rate":
+                    # date='...' value='...' as written by write_bnr_xml
+                    if len(attrs) == 4 and attrs[0] == "date" and attrs[2] == "value":
+                        append((attrs[1], currency, attrs[3]))
+                    else:
+                        attrs = dict(zip(attrs[::2], attrs[1::2]))
+                        append((attrs["date"], currency, attrs.get("value", None)))
+            elif depth == 2:
+                if in_values and name == "currency":
+                    currency = dict(zip(attrs[::2], attrs[1::2]))["name"]
+                else:
+                    currency = None
+            elif depth == 1:
+                in_values = name == "values"
+
+        def end(name):
+            nonlocal depth, currency
+            if depth == 2:
+                currency = None
+            depth -= 1
+
+        parser.StartElementHandler = start
+        parser.EndElementHandler = end
+
+    @property
+    def n_rows(self) -> int:
+        return len(self._rows)
+
+    def take_rows(self) -> list[tuple[str, str, str | None]]:
+        # `start` appends to the list it was built with, so empty that one
+        rows = self._rows[:]
+        self._rows.clear()
+        return rows
+
+    def feed(self, data: bytes) -> None:
+        self._parser.Parse(data, False)
+
+    def close(self) -> None:
+        self._parser.Parse(b"", True)
+
+
+_ROW_READERS = {"sax": _SaxRowReader, "expat": _ExpatRowReader}
+
+
+def iter_bnr_xml_batches(
+    file: str | Path | BinaryIO,
+    *,
+    batch_size: int = 8192,
+    chunk_size: int = 1 << 16,
+    parser: Literal["expat", "sax"] = "expat",
+) -> Iterator[list[tuple[str, str, str | None]]]:
+    # (date, currency, value) rows as the file is read, at most about
+    # batch_size at a time, so memory does not grow with the file
+    if isinstance(file, (str, Path)):
+        with open(file, "rb") as f:
+            yield from iter_bnr_xml_batches(
+                f, batch_size=batch_size, chunk_size=chunk_size, parser=parser
+            )
+        return
+
+    reader = _ROW_READERS[parser]()
+
+    while chunk := file.read(chunk_size):
+        reader.feed(chunk)
+        if reader.n_rows >= batch_size:
+            yield reader.take_rows()
+    reader.close()
+
+    if rows := reader.take_rows():
+        yield rows
+
+
+def _put_rows(map: CursMap, rows, dates: dict[str, dt.date]) -> None:
+    # rows come grouped by currency, and every date repeats once per
+    # currency: convert each date string only once
+    fromisoformat = dt.date.fromisoformat
+    currency, submap = None, None
+    for date_iso, row_currency, value in rows:
+        if row_currency != currency:
+            currency = row_currency
+            submap = map.get(currency)
+            if submap is None:
+                submap = map[currency] = dict()
+        date = dates.get(date_iso)
+        if date is None:
+            date = dates[date_iso] = fromisoformat(date_iso)
+        if value is not None:
+            # to_numeric(), inlined
+            value = float(value)
+            if value.is_integer():
+                value = int(value)
+        submap[date] = value
+
+
+def parse_bnr_xml(file, *, parser: Literal["expat", "sax"] = "expat") -> CursMap:
     map = CursMap()
-    xml_parse(file, _BnrXmlHandler(map))
+    if parser == "sax":
+        xml_parse(file, _BnrXmlHandler(map))
+        return map
+
+    dates = {}
+    for rows in iter_bnr_xml_batches(file, batch_size=1 << 16, chunk_size=1 << 20):
+        _put_rows(map, rows, dates)
     return map
 
 
+def format_bnr_xml_value(value: Numeric | None) -> str | None:
+    # a value's text in the file, as written below; floats keep 6 digits
+    if value is None:
+        return None
+    return f"{value:.6g}" if isinstance(value, float) else str(int(value))
+
+
+def append_bnr_xml_rates(
+    append: Callable[[str], object], rows: Iterable[tuple[str, Numeric | None]]
+) -> int:
+    # the <rate> lines of write_bnr_xml for (date_iso, value) rows, each
+    # passed to `append`; ISO dates and numbers have nothing to escape, and
+    # format_bnr_xml_value is inlined
+    n_rows = 0
+    for date_iso, value in rows:
+        n_rows += 1
+        if value is None:
+            append(f"\t\t<rate date='{date_iso}' />\n")
+        elif isinstance(value, float):
+            append(f"\t\t<rate date='{date_iso}' value='{value:.6g}' />\n")
+        else:
+            append(f"\t\t<rate date='{date_iso}' value='{int(value)}' />\n")
+    return n_rows
+
+
+def write_bnr_xml_stream(
+    currency_rows: Iterable[tuple[str, Iterable[tuple[str, Numeric | None]]]],
+    file,
+    *,
+    buffer_rows: int = 8192,
+) -> int:
+    # the same bytes as write_bnr_xml, from (currency, (date_iso, value) rows)
+    # in currency, date order; written buffer_rows lines at a time
+    if buffer_rows < 1:
+        raise ValueError(f"invalid buffer_rows {buffer_rows!r}")
+    n_rows = 0
+    with open(file, "w", encoding="utf-8", newline="\r\n", buffering=1 << 20) as f:
+        f.write("<?xml version='1.0' encoding='utf-8'?>\n")
+        f.write("<values>\n")
+
+        parts = []
+        append = parts.append
+        for currency, rows in currency_rows:
+            append(f"\t<currency name='{escape_attr(currency)}'>\n")
+            rows = iter(rows)
+            # only as many as fit in the buffer, so it flushes on the mark
+            while n := append_bnr_xml_rates(
+                append, islice(rows, max(buffer_rows - len(parts), 1))
+            ):
+                n_rows += n
+                if len(parts) >= buffer_rows:
+                    f.write("".join(parts))
+                    parts.clear()
+            append("\t</currency>\n")
+
+        f.write("".join(parts))
+        f.write("</values>")
+
+    return n_rows
+
+
 def write_bnr_xml(map: CursMap, file):
     with open(file, "w", encoding="utf-8", newline="\r\n") as f:
         f.write("<?xml version='1.0' encoding='utf-8'?>\n")
@@ -1,9 +1,9 @@
 #!/usr/bin/env python3
 
+import time
 from pathlib import Path
-from curs.xml import write_bnr_xml
+from curs.xml import write_bnr_xml_stream
 from curs.db import CursDB
-from curs.types import CursMap
 
 from argparse import ArgumentParser
 from sys import argv
@@ -31,13 +31,15 @@ else:
 print("Opening database...")
 db = CursDB(db_file, mode="ro")
 
-print("Retrieving items...")
-map = CursMap()
-for date, currency, value in db.select_rows(value_is_null=None):
-    map.put_value(date, currency, value)
+print("Writing XML file...")
 
-print(f"Retrieved {map.get_size()} items.\nWriting XML file...")
+# rows go from the cursor to the file in order, never all in memory
+start_time = time.perf_counter()
+n_rows = write_bnr_xml_stream(db.iter_currency_rows(iso_dates=True), xml_file)
+elapsed = time.perf_counter() - start_time
 
-write_bnr_xml(map, xml_file)
+print(
+    f"Wrote {n_rows} items in {elapsed:.2f} s ({n_rows / max(elapsed, 1e-9):.0f} rows/s)."
+)
 
 print("Done!")
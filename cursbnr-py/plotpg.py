@@ -0,0 +1,68 @@
+import time
+from typing import Any, Mapping
+
+import numpy as np
+import pyqtgraph as pg
+
+# same input as plotqt.MplCanvas.set_plot_data, drawn by pyqtgraph; it
+# thins out and clips the curves to the view by itself on every pan/zoom
+
+
+class PgCanvas(pg.PlotWidget):
+    def __init__(self, parent=None, *, timing: bool = False):
+        super(PgCanvas, self).__init__(
+            parent,
+            background="w",
+            axisItems={"bottom": pg.DateAxisItem(orientation="bottom", utcOffset=0)},
+        )
+        self._curves = {}
+        self._timing = timing
+
+        item = self.getPlotItem()
+        item.showGrid(x=False, y=True)
+        item.setLabel("left", "RON")
+        item.addLegend()
+        item.setDownsampling(auto=True, mode="peak")
+        item.setClipToView(True)
+
+    def set_plot_data(self, data: Mapping[str, Mapping[str, Any]]):
+        start_time = time.perf_counter()
+        item = self.getPlotItem()
+
+        for label in self._curves.keys() - data.keys():
+            item.removeItem(self._curves.pop(label))
+
+        for label, line in data.items():
+            x, y = self._xy(**line)
+            # no symbols on long ranges, as in MplCanvas
+            symbol = "o" if len(x) <= 180 else None
+            pen = pg.mkPen(color=self._rgba(line.get("color")), width=1.5)
+
+            curve = self._curves.get(label)
+            if curve is None:
+                self._curves[label] = item.plot(
+                    x, y, name=label, pen=pen, symbol=symbol, symbolSize=5
+                )
+            else:
+                curve.setData(x, y, pen=pen, symbol=symbol)
+
+        item.enableAutoRange()
+
+        if self._timing:
+            n_points = sum(len(curve.xData) for curve in self._curves.values())
+            print(
+                f"replot (pyqtgraph): {len(self._curves)} lines, {n_points} points,"
+                f" {(time.perf_counter() - start_time) * 1000:.1f} ms"
+            )
+
+    @staticmethod
+    def _xy(*, x, y, color=None) -> tuple[np.ndarray, np.ndarray]:
+        # DateAxisItem wants POSIX seconds
+        x = np.asarray(x, dtype="datetime64[D]").astype("datetime64[s]")
+        return x.astype(np.int64).astype(np.float64), np.asarray(y, dtype=np.float64)
+
+    @staticmethod
+    def _rgba(color) -> tuple[int, ...] | None:
+        if color is None:
+            return None
+        return tuple(int(round(255 * c)) for c in color)
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 import sys
+import time
 from pathlib import Path
 from typing import Any, Mapping, Sequence
 
@@ -9,8 +10,11 @@ from dateutil.relativedelta import relativedelta
 from dateutil.utils import today
 
 import numpy as np
+from curs.cache import SeriesCache
 from curs.db import CursDB
-from curs.types import Date, extract_dates_values, to_date_opt, to_date
+from curs.lod import m4_indices
+from curs.types import Date, to_date_opt, to_date
+from matplotlib import dates as mdates
 from matplotlib.figure import Figure
 from matplotlib.pyplot import cm
 from qtpy import QtCore, QtGui, QtWidgets  # noqa: F401
@@ -59,6 +63,19 @@ def main():
         default=None,
     )
 
+    arg_parser.add_argument(
+        "--backend",
+        choices=("matplotlib", "pyqtgraph"),
+        default="matplotlib",
+        help="what draws the plot",
+    )
+
+    arg_parser.add_argument(
+        "--timing",
+        action="store_true",
+        help="print how long each replot takes",
+    )
+
     args = arg_parser.parse_args(argv[1:])
 
     if args.db is None:
@@ -77,6 +94,9 @@ def main():
     pp = {}
     if args.currency is not None:
         pp["currency"] = args.currency
+    if args.timing:
+        pp["timing"] = True
+    pp["backend"] = args.backend
 
     app = QtWidgets.QApplication(sys.argv)
     _ = CursWindow(db=db, date_range=(args.start_date, args.end_date), **pp)
@@ -89,23 +109,95 @@ from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT  # noqa: E40
 
 
 class MplCanvas(FigureCanvasQTAgg):
-    def __init__(self, parent=None, dpi=100):
+    def __init__(self, parent=None, dpi=100, *, timing: bool = False):
         self._plot_data = {}
+        self._lines = {}
+        self._axes = None
+        self._background = None
+        self._timing = timing
 
         super(MplCanvas, self).__init__(Figure((6.4, 4.8), dpi=dpi))
         # self.figure.set_rasterized(True)
+        self.mpl_connect("resize_event", self._on_resize)
+        self.mpl_connect("draw_event", self._on_draw)
 
     def set_plot_data(self, data: Mapping[str, Mapping[str, Any]]):
+        start_time = time.perf_counter()
         new_plot_data = dict()
         for currency, data in data.items():
             self._add_plot_data(new_plot_data, currency, **data)
         self._plot_data = new_plot_data
-        self._replot()
-        self.draw()
+        mode = self._replot()
+        if self._timing:
+            n_points = sum(len(line.get_xdata()) for line in self._lines.values())
+            print(
+                f"replot ({mode}): {len(self._lines)} lines, {n_points} points,"
+                f" {(time.perf_counter() - start_time) * 1000:.1f} ms"
+            )
 
     @staticmethod
     def _add_plot_data(_plot_data, /, currency: str, *, x, y, color=None):
-        _plot_data[currency] = {"x": x, "y": y, "color": color}
+        x, y = np.asarray(x), np.asarray(y, dtype=np.float64)
+        _plot_data[currency] = {
+            "x": x,
+            "y": y,
+            "color": color,
+            "xnum": mdates.date2num(x) if len(x) else np.array([], dtype=np.float64),
+        }
+
+    @staticmethod
+    def _decimated(data, x_range: tuple[float, float], n_buckets: int):
+        # only as many points as the axes have pixel columns can show
+        if not len(data["x"]):
+            return data["x"], data["y"]
+        indices = m4_indices(data["xnum"], data["y"], x_range, n_buckets)
+        return data["x"][indices], data["y"][indices]
+
+    def _pixel_width(self) -> int:
+        axes = self._axes if self._axes is not None else self.figure
+        return max(int(axes.get_window_extent().width), 1)
+
+    def _redecimate(self, axes=None):
+        if not self._lines:
+            return
+        x_range = self._axes.get_xlim()
+        n_buckets = self._pixel_width()
+        for label, line in self._lines.items():
+            line.set_data(*self._decimated(self._plot_data[label], x_range, n_buckets))
+        self.draw_idle()
+
+    def _on_resize(self, event):
+        if self._axes is not None:
+            self.figure.tight_layout()
+        self._redecimate()
+
+    def _on_draw(self, event):
+        # the lines are animated: keep what is under them for blitting,
+        # then put them on top
+        self._background = self.copy_from_bbox(self.figure.bbox)
+        self._draw_lines()
+
+    def _draw_lines(self):
+        for line in self._lines.values():
+            self._axes.draw_artist(line)
+
+    def _blit_lines(self) -> bool:
+        if self._background is None:
+            return False
+        self.restore_region(self._background)
+        self._draw_lines()
+        self.blit(self.figure.bbox)
+        return True
+
+    def print_figure(self, *args, **kwargs):
+        # animated artists are left out of saved images
+        for line in self._lines.values():
+            line.set_animated(False)
+        try:
+            return super().print_figure(*args, **kwargs)
+        finally:
+            for line in self._lines.values():
+                line.set_animated(True)
 
     if False:  # due to navigation toolbar
 
@@ -123,21 +215,32 @@ class MplCanvas(FigureCanvasQTAgg):
 
             self._replot()
 
-    def _replot(self):
-        fig: Figure = self.figure
-        if len(self._plot_data) == 0:
-            return
-
-        fig.clear()
-        axes = fig.add_subplot(111)
+    def _create_axes(self):
+        axes = self.figure.add_subplot(111)
         axes.locator_params(axis="x", tight=True, nbins=64)
         axes.locator_params(axis="y", tight=True, nbins=36)
         axes.tick_params(labelsize=6)
+        axes.grid(True, which="both", axis="y")
+        axes.set_ylabel("RON")
+        # zooming and panning pick the points for the new range
+        axes.callbacks.connect("xlim_changed", self._redecimate)
+        return axes
+
+    def _replot(self) -> str:
+        # updates the lines in place; the legend and the layout are only
+        # redone when the set of lines or the axes limits change
+        fig: Figure = self.figure
+        if len(self._plot_data) == 0:
+            return "none"
+
+        if self._axes is None:
+            self._axes = self._create_axes()
+        axes = self._axes
 
         def n_days(x: Sequence[Date]):
             if not len(x):
                 return 0
-            return (x[-1] - x[0]).days
+            return int(np.timedelta64(x[-1] - x[0], "D").astype(np.int64))
 
         n_max_days = max(map(lambda data: n_days(data["x"]), self._plot_data.values()))
 
@@ -155,24 +258,56 @@ class MplCanvas(FigureCanvasQTAgg):
                 marker = None
                 markersize = None
 
+        x_num = [data["xnum"] for data in self._plot_data.values() if len(data["x"])]
+        x_range = (
+            (min(x[0] for x in x_num), max(x[-1] for x in x_num)) if x_num else (0, 1)
+        )
+        n_buckets = self._pixel_width()
+
+        lines_changed = self._lines.keys() != self._plot_data.keys()
+        for label in self._lines.keys() - self._plot_data.keys():
+            self._lines.pop(label).remove()
+
         for label, data in self._plot_data.items():
-            x = data["x"]
-            y = data["y"]
-
-            axes.plot(
-                x,
-                y,
-                label=label,
-                marker=marker,
-                color=data["color"],
-                markersize=markersize,
+            x, y = self._decimated(data, x_range, n_buckets)
+            line = self._lines.get(label)
+            if line is None:
+                (line,) = axes.plot(x, y, label=label, animated=True)
+                self._lines[label] = line
+            else:
+                line.set_data(x, y)
+            line.set_color(data["color"])
+            line.set_marker(marker)
+            line.set_markersize(
+                markersize
+                if markersize is not None
+                else matplotlib.rcParams["lines.markersize"]
             )
 
-        fig.autofmt_xdate(rotation=45)
-        fig.set_tight_layout(True)
-        axes.grid(True, which="both", axis="y")
-        axes.set_ylabel("RON")
-        axes.legend()
+        # zooming or panning with the toolbar turns autoscaling off, and
+        # its home view is still the old data's
+        limits = axes.get_xlim(), axes.get_ylim()
+        axes.set_autoscale_on(True)
+        axes.relim()
+        axes.autoscale_view()
+        limits_changed = limits != (axes.get_xlim(), axes.get_ylim())
+        if self.toolbar is not None:
+            self.toolbar.update()
+
+        if lines_changed:
+            axes.legend(handles=[self._lines[label] for label in self._plot_data])
+
+        if lines_changed or limits_changed:
+            fig.autofmt_xdate(rotation=45)
+            fig.tight_layout()
+            self.draw()
+            return "draw"
+
+        if self._blit_lines():
+            return "blit"
+
+        self.draw()
+        return "draw"
 
     if False:  # due to navigation toolbar
 
@@ -185,8 +320,11 @@ class CursWindow(QtWidgets.QMainWindow):
     def __init__(self, *args, **kwargs):
         self._db = kwargs.pop("db")
         db = self._db
+        self._cache = SeriesCache(db)
         date_from, date_to = map(to_date_opt, kwargs.pop("date_range", (None, None)))
         currency = kwargs.pop("currency", "EUR")
+        self._timing = kwargs.pop("timing", False)
+        self._backend = kwargs.pop("backend", "matplotlib")
 
         self._past_currencies = set()
 
@@ -196,7 +334,7 @@ class CursWindow(QtWidgets.QMainWindow):
             date_from=date_from,
             date_to=date_to,
             currency=currency,
-            date_range=db.get_date_range(),
+            date_range=self._cache.get_date_range(),
             currencies=db.get_currencies(),
         )
 
@@ -215,9 +353,15 @@ class CursWindow(QtWidgets.QMainWindow):
         date_range: tuple[Date, Date],
         currencies: list[str],
     ):
-        # Create the maptlotlib FigureCanvas object,
-        # which defines a single set of axes as self.axes.
-        plot = MplCanvas(self, dpi=100)
+        if self._backend == "pyqtgraph":
+            from plotpg import PgCanvas
+
+            plot, toolbar = PgCanvas(self, timing=self._timing), None
+        else:
+            # Create the maptlotlib FigureCanvas object,
+            # which defines a single set of axes as self.axes.
+            plot = MplCanvas(self, dpi=100, timing=self._timing)
+            toolbar = NavigationToolbar2QT(plot, self)
 
         top_row = QHBoxLayout()
 
@@ -273,9 +417,8 @@ class CursWindow(QtWidgets.QMainWindow):
 
         self._plot = plot
 
-        toolbar = NavigationToolbar2QT(plot, self)
-
-        layout.addWidget(toolbar)
+        if toolbar is not None:
+            layout.addWidget(toolbar)
 
         center = QWidget()
         center.setLayout(layout)
@@ -309,7 +452,7 @@ class CursWindow(QtWidgets.QMainWindow):
             self._date_to_edit.setDate(i_to if i_to is not None else date_to)
 
     def _replot_xy(self):
-        db = self._db
+        cache = self._cache
 
         date_from = self._date_from_edit.date().toPyDate()
         date_to = self._date_to_edit.date().toPyDate()
@@ -320,14 +463,12 @@ class CursWindow(QtWidgets.QMainWindow):
         if self._keep_ckb.isChecked():
             currencies.update(self._past_currencies)
 
-        rows = db.select_value_rows(
-            date=(date_from, date_to), currency=list(currencies)
-        )
+        series = cache.select_series(sorted(currencies), (date_from, date_to))
         colors = self._generate_colors(len(currencies))
 
         data = {
             currency: (lambda x, y: {"x": x, "y": y, "color": colors[i]})(
-                *extract_dates_values(rows, currency=currency)
+                *series[currency]
             )
             for i, currency in enumerate(sorted(currencies))
         }
@@ -335,7 +476,7 @@ class CursWindow(QtWidgets.QMainWindow):
         self._plot.set_plot_data(data)
         self._past_currencies = currencies
 
-        self._set_minmax_date(db.get_date_range())
+        self._set_minmax_date(cache.get_date_range())
 
 
 if __name__ == "__main__":
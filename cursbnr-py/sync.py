@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+import time
+from pathlib import Path
+from curs.sync import XmlSync
+from curs.db import CursDB
+
+from argparse import ArgumentParser
+from sys import argv
+
+arg_parser = ArgumentParser()
+
+arg_parser.add_argument(
+    "--xml", metavar="XML", type=str, help="xml cache file", default="bnr.xml"
+)
+arg_parser.add_argument("--db", metavar="DB", type=str, help="database", default=None)
+arg_parser.add_argument(
+    "--full",
+    action="store_true",
+    default=False,
+    help="read every currency block again, not just the changed ones",
+)
+
+args = arg_parser.parse_args(argv[1:])
+xml_file = Path(args.xml)
+if not xml_file.parent.exists() or not xml_file.parent.is_dir():
+    raise AssertionError(f"invalid xml file path {xml_file!s}")
+
+if args.db is None:
+    db_file = Path(__file__).parent / "bnr.db"
+else:
+    db_file = Path(args.db)
+    if not db_file.parent.exists() or not db_file.parent.is_dir():
+        raise AssertionError(f"invalid db file path {db_file!s}")
+
+# %%
+print("Opening database...")
+db = CursDB(db_file)
+
+print("Syncing...")
+
+# only the currency blocks that changed on either side are read or written
+start_time = time.perf_counter()
+result = XmlSync(db, xml_file).sync(full=args.full)
+elapsed = time.perf_counter() - start_time
+
+print(
+    f"Read {len(result.blocks_read)} currencies from XML,"
+    f" {result.rows_imported} rows affected."
+)
+print(
+    f"Wrote {len(result.blocks_written)} currencies to XML,"
+    f" {result.rows_exported} items."
+)
+print(f"Synced in {elapsed * 1000:.1f} ms.")
+print("Done!")
@@ -1,25 +1,36 @@
 #!/usr/bin/env python3
 
 # %%
+import asyncio
 from collections.abc import Iterable
-import re
 import threading
 import time
 from argparse import ArgumentParser, Namespace
 from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import chain
 from pathlib import Path
 from sys import argv
-from typing import Final
 
-from curs.client import CursClient, Date
+from curs.client import ConnectionPool, CursClient, Date
 
 # %%
 from curs.db import CursDB
+from curs.engine import AsyncFetchEngine, FetchJob
+from curs.plan import plan_missing
+from curs.journal import WorkJournal
+from curs.presence import PresenceIndex
+from curs.pubcalendar import PublicationCalendar
+from curs.sched import (
+    PERMANENT_ERRORS,
+    TRANSIENT_ERRORS,
+    AimdLimiter,
+    CircuitOpenError,
+    RequestScheduler,
+    RetryPolicy,
+)
 from curs.threadutils import thread_local_cached
 from curs.types import DateCurrencyOptValueRow, to_date
 from dateutil.relativedelta import relativedelta
-from dateutil.rrule import DAILY, rrule
-from suds import WebFault
 from tqdm import tqdm
 
 
@@ -40,8 +51,6 @@ def main():
 
     commit_every_n = 1024
 
-    autoexclude: Final[bool] = True
-
     # %%
 
     db = CursDB(get_db_file_name(__file__, args))
@@ -51,13 +60,33 @@ def main():
     thread_lock = threading.Lock()
 
     @thread_local_cached
-    def get_client() -> CursClient:
-        return CursClient(use_local_wsdl=not True)
+    def get_suds_client() -> CursClient:
+        return CursClient(use_local_wsdl=args.url is not None, url=args.url)
+
+    if args.transport == "suds":
+        get_client = get_suds_client
+    else:
+        # thread-safe, one instance and connection pool shared by all workers
+        shared_client = CursClient(
+            lightweight=True,
+            url=args.url,
+            pool=ConnectionPool(
+                max_per_host=args.max_connections, idle_timeout=args.idle_timeout
+            ),
+        )
+
+        def get_client() -> CursClient:
+            return shared_client
 
     # %%
 
     client = get_client()
 
+    # the startup calls are retried like the fetches; the fetch scheduler
+    # itself is sized by the number of currencies, which they return
+    retry = RetryPolicy(retries=args.retries)
+    startup_sched = RequestScheduler(rate=args.rate, retry=retry)
+
     _before_first_valid_date: dict[str, Date] = invert_date_to_curr_list(
         before_first_valid_date_
     )
@@ -66,33 +95,83 @@ def main():
 
     # %%
     currencies, all_currencies = get_currencies(
-        _before_first_valid_date, _last_valid_date, client
+        _before_first_valid_date, _last_valid_date, client, startup_sched
     )
     print(" ".join(all_currencies))
 
-    xcache = set()
+    n_workers = len(currencies) + len(_last_valid_date)
+    if args.concurrency is not None:
+        n_workers = args.concurrency
+    tpx = ThreadPoolExecutor(n_workers)
 
-    for date, currency in db.select_date_currency_rows(
-        currency=all_currencies, value_is_null=None
-    ):
-        xcache.add((date, currency))
+    # %%
 
-    tpx = ThreadPoolExecutor(len(currencies) + len(_last_valid_date))
+    start_date, end_date = get_start_date_end_date(args, client, startup_sched)
 
-    # %%
+    journal = WorkJournal(db)
+    presence = None
 
-    start_date, end_date = get_start_date_end_date(args, client)
+    if args.resume and journal.has_work:
+        plan = journal.pending_plan()
+        print(f"Resuming {len(plan)} planned values from the work journal.")
+        calendar = PublicationCalendar.load(
+            db,
+            plan.date_range,
+            before_first_valid_date=_before_first_valid_date,
+        )
 
-    days = list(
-        map(
-            lambda d: d.date(),
-            rrule(DAILY, start_date, until=end_date),
+    else:
+        presence = PresenceIndex.load(db, start_date, end_date, all_currencies)
+
+        calendar = PublicationCalendar.load(
+            db,
+            (start_date, end_date),
+            before_first_valid_date=_before_first_valid_date,
+        )
+
+        plan = plan_missing(
+            presence,
+            all_currencies,
+            start_date=start_date,
+            end_date=end_date,
+            before_first_valid_date=_before_first_valid_date,
+            last_valid_date=_last_valid_date,
+            calendar=calendar,
         )
+
+    print(
+        f"{len(plan)} missing values in {len(plan.runs)} runs over"
+        f" {plan.count_days()} days: {plan.count_requests(bulk=args.bulk)}"
+        " requests to issue."
     )
-    days.reverse()
-    loop = tqdm(days, leave=False)
+    if plan.closed is not None:
+        print(f"{len(plan.closed)} values on non-publishing days need no request.")
+    if args.dry_run:
+        return
+
+    if presence is not None:
+        plan = journal.replan(plan)
+        db.commit()
+
+    loop = tqdm(plan.days(), total=plan.count_days(), leave=False)
+    per_day = args.bulk or args.probe
 
-    prev_total_changes = db.total_changes
+    def on_circuit_open(currency: str):
+        with thread_lock:
+            tqdm.write(f"Skipping {currency} after repeated faults")
+            exclude_currency.append(currency)
+
+    exclude_currency = []
+    sched = RequestScheduler(
+        rate=args.rate,
+        limiter=AimdLimiter(initial=min(4, n_workers), maximum=n_workers),
+        retry=retry,
+        on_circuit_open=on_circuit_open,
+    )
+
+    # not total_changes, which also counts the work journal's updates
+    rows_written = 0
+    start_time = time.perf_counter()
     try:
         inserted = 0
 
@@ -101,83 +180,191 @@ def main():
             inserted += count
             if inserted >= commit_every_n:
                 loop.set_postfix_str("COMMITING...  ")
+                journal.flush()
                 db.commit()
                 inserted = 0
 
-        def fetch(date, currency) -> DateCurrencyOptValueRow | None:
+        def put_rows(rows: list[DateCurrencyOptValueRow]):
+            nonlocal rows_written
+            db.put_rows(rows)
+            rows_written += len(rows)
+            journal.complete(rows)
+            if presence is not None:
+                presence.add_rows(rows)
+            after_insert(len(rows))
+
+        if plan.closed is not None:
+            put_rows(
+                [
+                    DateCurrencyOptValueRow(date, currency, None)
+                    for date, currency in plan.closed.cells()
+                ]
+            )
+
+        def fetch(date, currency, *, ask=False) -> DateCurrencyOptValueRow | None:
+            # unless asked to, days the calendar takes for closed get no request
             try:
+                if not ask and calendar.is_closed(date):
+                    return DateCurrencyOptValueRow(date, currency, None)
+
                 loop.set_postfix_str(f"{date} {currency}")
-                r_date, r_currency, r_value = get_client().get_value(date, currency)
+                r_date, r_currency, r_value = sched.call(
+                    get_client().get_value, date, currency, key=currency
+                )
                 if r_date != date:
+                    if calendar.is_sentinel(date, currency):
+                        calendar.mark_closed(date)
                     return DateCurrencyOptValueRow(date, currency, None)
                 else:
+                    calendar.mark_open(date)
                     return DateCurrencyOptValueRow(r_date, r_currency, r_value)
-            except WebFault as wf:
+            except CircuitOpenError:
+                journal.release(date, currency)
+            except PERMANENT_ERRORS + TRANSIENT_ERRORS as ex:
                 with thread_lock:
-                    tqdm.write(f"{wf!s} @{date} {currency})")
-                    if autoexclude:
-                        if re.fullmatch(
-                            r".*Object reference not set to an instance of an object\..*",
-                            str(wf),
-                        ):
-                            tqdm.write(f"Skipping {currency} before {date}")
-                            exclude_currency.append(currency)
-
-        exclude_currency = []
-        for date in loop:
-            futures: list[Future] = []
+                    tqdm.write(f"{ex!s} @{date} {currency})")
+                journal.fail(
+                    date, currency, str(ex), permanent=isinstance(ex, PERMANENT_ERRORS)
+                )
+
+        def fetch_day(
+            date: Date, day_currencies: list[str]
+        ) -> list[DateCurrencyOptValueRow]:
+            # getvalueadv for the sentinels, asked even on days the calendar
+            # takes for closed, to tell whether `date` was published at all,
+            # then (in bulk mode) a single getall for the remaining currencies
+            rows: list[DateCurrencyOptValueRow] = []
+            others = calendar.sentinel_first(date, day_currencies)
+            n_stale = 0
+            while others and calendar.is_sentinel(date, others[0]):
+                row = fetch(date, others.pop(0), ask=True)
+                if row is None:
+                    continue
+                rows.append(row)
+                if row.value is not None:
+                    break
+                n_stale += 1
+
+            if n_stale and all(row.value is None for row in rows):
+                if n_stale < 2:
+                    # one sentinel may just be missing that day: the rest
+                    # is left unwritten for a later run, not stored as NULL
+                    return rows
+                rows.extend(
+                    DateCurrencyOptValueRow(date, currency, None) for currency in others
+                )
+                return rows
+
+            values = {}
+            if args.bulk and others and not calendar.is_closed(date):
+                try:
+                    loop.set_postfix_str(f"{date} *")
+                    values = dict(sched.call(get_client().get_all, date))
+                except PERMANENT_ERRORS + TRANSIENT_ERRORS as ex:
+                    with thread_lock:
+                        tqdm.write(f"{ex!s} @{date} *)")
+
+            for currency in others:
+                if currency in values:
+                    rows.append(
+                        DateCurrencyOptValueRow(date, currency, values[currency])
+                    )
+                else:
+                    row = fetch(date, currency)
+                    if row is not None:
+                        rows.append(row)
+
+            return rows
+
+        def get_rows(f: Future) -> Iterable[DateCurrencyOptValueRow | None]:
+            result = f.result()
+            return result if isinstance(result, list) else (result,)
+
+        def is_not_None(r) -> bool:
+            return r is not None
+
+        def put_results(futures: list[Future]):
+            results = list(
+                filter(is_not_None, chain.from_iterable(map(get_rows, futures)))
+            )
+            futures.clear()
+            put_rows(results)
+
+        excluded: set[str] = set()
+
+        def plan_day(date: Date, day_currencies: list[str]) -> list[FetchJob]:
+            day_currencies = [c for c in day_currencies if c not in excluded]
+            if not day_currencies:
+                return []
+
+            journal.start(date, day_currencies)
+            if per_day:
+                return [(fetch_day, (date, day_currencies))]
+            else:
+                return [(fetch, (date, currency)) for currency in day_currencies]
+
+        def drop_excluded_currencies() -> bool:
+            with thread_lock:
+                excluded.update(exclude_currency)
+                exclude_currency.clear()
 
-            try:
-                for currency, a_date in list(_last_valid_date.items()):
-                    if date <= _last_valid_date[currency]:
-                        if currency not in currencies:
-                            currencies.append(currency)
-                        del _last_valid_date[currency]
-
-                for currency in currencies:
-                    if (date, currency) in xcache:
-                        # xcache.remove((date, currency))
-                        continue  # inner loop
-
-                    if currency in _before_first_valid_date:
-                        if date <= _before_first_valid_date[currency]:
-                            exclude_currency.append(currency)
-                            del _before_first_valid_date[currency]
-
-                            continue  # inner loop
-
-                    if not db.select_rows(
-                        date=date, currency=currency, value_is_null=None
-                    ):
-                        futures.append(tpx.submit(fetch, date, currency))
-                        time.sleep(0.001)
+            return excluded.issuperset(plan.currencies)
 
-            finally:
+        if args.engine == "async":
 
-                def get_result(f: Future):
-                    return f.result()
+            def jobs() -> Iterable[FetchJob]:
+                for date, day_currencies in loop:
+                    yield from plan_day(date, day_currencies)
 
-                def is_not_None(r) -> bool:
-                    return r is not None
+                    if drop_excluded_currencies():
+                        break  # outer loop
 
-                results = list(filter(is_not_None, map(get_result, futures)))
-                futures.clear()
-                db.put_rows(results)
-                after_insert(len(results))
+            engine = AsyncFetchEngine(
+                concurrency=n_workers, executor=tpx, put_rows=put_rows
+            )
+            asyncio.run(engine.run(jobs()))
 
-            if exclude_currency:
-                for currency in exclude_currency:
-                    currencies.remove(currency)
-                exclude_currency.clear()
+        else:
+            futures: list[Future] = []
+            try:
+                for date, day_currencies in loop:
+                    try:
+                        for func, func_args in plan_day(date, day_currencies):
+                            futures.append(tpx.submit(func, *func_args))
 
-                if not currencies:
-                    break  # outer loop
+                    finally:
+                        # in bulk mode, keep several days in flight at once
+                        if not per_day or len(futures) >= n_workers:
+                            put_results(futures)
+
+                    if drop_excluded_currencies():
+                        break  # outer loop
+
+            finally:
+                put_results(futures)
 
     except KeyboardInterrupt:
         pass
 
     finally:
-        print(f"{db.total_changes - prev_total_changes} rows affected.")
+        elapsed = time.perf_counter() - start_time
+        stats = sched.stats
+        journal.flush()
+        journal.prune()
+        print(f"{rows_written} rows affected.")
+        print(
+            f"{stats.requests} requests in {elapsed:.1f}s"
+            f" ({stats.requests / max(elapsed, 1e-9):.1f} requests/sec),"
+            f" {stats.retries} retries, {stats.failures} failures,"
+            f" final concurrency {stats.limit}."
+        )
+        pool_stats = get_client().pool_stats
+        if pool_stats is not None:
+            print(
+                f"{pool_stats.connects} connections for {pool_stats.requests} requests"
+                f" (reuse ratio {pool_stats.reuse_ratio:.1%},"
+                f" mean connect time {pool_stats.mean_connect_time * 1000:.1f} ms)."
+            )
         db.commit()
 
 
@@ -199,9 +386,10 @@ def get_currencies(
     before_first_valid_date: dict[str, Date],
     last_valid_date: dict[str, Date],
     client: CursClient,
+    sched: RequestScheduler,
 ):
     if True:
-        currencies = list(map(lambda x: x[0], client.get_all()))
+        currencies = list(map(lambda x: x[0], sched.call(client.get_all)))
     else:
         currencies = list(before_first_valid_date.keys())
 
@@ -215,6 +403,84 @@ def parse_args():
     arg_parser.add_argument(
         "--db", metavar="DB", type=str, help="target database", default=None
     )
+    arg_parser.add_argument(
+        "--bulk",
+        action="store_true",
+        help="fetch all currencies of a day with a single getall request",
+        default=False,
+    )
+    arg_parser.add_argument(
+        "--probe",
+        action="store_true",
+        help="probe each day with one sentinel request before fetching the rest",
+        default=False,
+    )
+    arg_parser.add_argument(
+        "--rate",
+        metavar="RPS",
+        type=float,
+        help="maximum requests per second",
+        default=None,
+    )
+    arg_parser.add_argument(
+        "--retries",
+        metavar="N",
+        type=int,
+        help="retries of a request after transient errors",
+        default=5,
+    )
+    arg_parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue the work planned by an interrupted run",
+        default=False,
+    )
+    arg_parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="only print how many requests would be issued",
+        default=False,
+    )
+    arg_parser.add_argument(
+        "--url",
+        metavar="URL",
+        type=str,
+        help="service location, e.g. of a local mock server",
+        default=None,
+    )
+    arg_parser.add_argument(
+        "--transport",
+        choices=("light", "suds"),
+        help="SOAP client implementation",
+        default="light",
+    )
+    arg_parser.add_argument(
+        "--max-connections",
+        metavar="N",
+        type=int,
+        help="keep-alive connections per host for the light transport",
+        default=8,
+    )
+    arg_parser.add_argument(
+        "--idle-timeout",
+        metavar="SECONDS",
+        type=float,
+        help="close keep-alive connections idle for longer than this",
+        default=30.0,
+    )
+    arg_parser.add_argument(
+        "--engine",
+        choices=("threads", "async"),
+        help="fetch engine; 'async' keeps a fixed number of requests in flight",
+        default="threads",
+    )
+    arg_parser.add_argument(
+        "--concurrency",
+        metavar="N",
+        type=int,
+        help="number of concurrent requests",
+        default=None,
+    )
 
     start_date_args = arg_parser.add_mutually_exclusive_group()
 
@@ -262,14 +528,15 @@ def parse_args():
     return args
 
 
-def get_start_date_end_date(args: Namespace, client: CursClient) -> tuple[Date, Date]:
+def get_start_date_end_date(
+    args: Namespace, client: CursClient, sched: RequestScheduler
+) -> tuple[Date, Date]:
     start_date = to_date("1998-01-01")
     if args.start_date is not None:
         start_date = to_date(args.start_date)
+    lastdate = sched.call(lambda: client.lastdate)
     end_date = (
-        client.lastdate
-        if args.end_date is None
-        else min(client.lastdate, to_date(args.end_date))
+        lastdate if args.end_date is None else min(lastdate, to_date(args.end_date))
     )
 
     if args.days is not None:
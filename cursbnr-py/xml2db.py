@@ -1,54 +1,156 @@
 #!/usr/bin/env python3
 
 # %%
+import glob
+import os
+import time
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
-from curs.xml import parse_bnr_xml
+from curs.ingest import RowArrays, RowMerger, iter_bnr_xml_arrays, read_bnr_xml_arrays
 from curs.db import CursDB
+from tqdm import tqdm
 
 from argparse import ArgumentParser
 from sys import argv
 
-arg_parser = ArgumentParser()
 
-arg_parser.add_argument("--replace", action="store_true", default=False)
-arg_parser.add_argument(
-    "--xml", metavar="XML", type=str, help="source xml", default="bnr.xml"
-)
-arg_parser.add_argument(
-    "--db", metavar="DB", type=str, help="target database", default=None
-)
+def parse_args():
+    arg_parser = ArgumentParser()
 
-args = arg_parser.parse_args(argv[1:])
-xml_file = Path(args.xml)
-if not xml_file.exists() or not xml_file.is_file():
-    raise AssertionError(f"invalid xml file path {xml_file!s}")
+    arg_parser.add_argument("--replace", action="store_true", default=False)
+    arg_parser.add_argument(
+        "xml",
+        metavar="XML",
+        type=str,
+        nargs="*",
+        help="source xml files or glob patterns",
+    )
+    arg_parser.add_argument(
+        "--xml",
+        metavar="XML",
+        type=str,
+        dest="xml_option",
+        action="append",
+        default=[],
+        help="source xml, may be repeated (default: bnr.xml)",
+    )
+    arg_parser.add_argument(
+        "--db", metavar="DB", type=str, help="target database", default=None
+    )
+    arg_parser.add_argument(
+        "--batch-size",
+        metavar="N",
+        type=int,
+        help="rows per insert",
+        default=8192,
+    )
+    arg_parser.add_argument(
+        "--jobs",
+        "-j",
+        metavar="N",
+        type=int,
+        help="files parsed at once when merging several (default: number of CPUs)",
+        default=os.cpu_count() or 1,
+    )
 
-if args.db is None:
-    db_file = Path(__file__).parent / "bnr.db"
-else:
-    db_file = Path(args.db)
-    if not db_file.parent.exists() or not xml_file.parent.is_dir():
-        raise AssertionError(f"invalid db file path {db_file!s}")
+    return arg_parser.parse_args(argv[1:])
 
-# %%
-print("Opening database...")
-db = CursDB(db_file)
 
-# %%
-print("Parsing XML...")
-map = parse_bnr_xml(xml_file)
+def expand_xml_files(patterns: list[str]) -> list[Path]:
+    # in the order given, each glob sorted; later files win conflicts
+    xml_files = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) or [pattern]
+        for match in matches:
+            xml_file = Path(match)
+            if not xml_file.exists() or not xml_file.is_file():
+                raise AssertionError(f"invalid xml file path {xml_file!s}")
+            if xml_file not in xml_files:
+                xml_files.append(xml_file)
+    return xml_files
 
-print(f"Read {map.get_size()} items.")
 
-# %%
+def iter_xml_arrays(
+    xml_files: list[Path], jobs: int
+) -> Iterator[tuple[Path, RowArrays]]:
+    # parsed in worker processes, but handed back in file order, which
+    # decides conflicts; the next `jobs` files are parsed meanwhile
+    if jobs <= 1:
+        for xml_file in xml_files:
+            yield xml_file, read_bnr_xml_arrays(xml_file)
+        return
+
+    files = iter(xml_files)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        pending = deque(
+            (xml_file, pool.submit(read_bnr_xml_arrays, xml_file))
+            for xml_file in islice(files, jobs)
+        )
+        while pending:
+            xml_file, future = pending.popleft()
+            rows = future.result()
+            for next_file in islice(files, 1):
+                pending.append((next_file, pool.submit(read_bnr_xml_arrays, next_file)))
+            yield xml_file, rows
+
+
+def main():
+    args = parse_args()
+    xml_files = expand_xml_files(args.xml + args.xml_option or ["bnr.xml"])
+
+    if args.db is None:
+        db_file = Path(__file__).parent / "bnr.db"
+    else:
+        db_file = Path(args.db)
+        if not db_file.parent.exists() or not db_file.parent.is_dir():
+            raise AssertionError(f"invalid db file path {db_file!s}")
+
+    # %%
+    print("Opening database...")
+    db = CursDB(db_file)
+
+    # %%
+    print(f"Importing {len(xml_files)} XML files...")
+
+    start_time = time.perf_counter()
+    with tqdm(
+        total=sum(xml_file.stat().st_size for xml_file in xml_files),
+        unit="B",
+        unit_scale=True,
+        leave=False,
+    ) as progress:
+        # later rows win conflicts, within a file too, unless they have no value
+        merger = RowMerger(db, replace=args.replace, batch_size=args.batch_size)
+        if len(xml_files) == 1:
+            # nothing to parse ahead: rows are merged in batch by batch as
+            # the file is parsed
+            with open(xml_files[0], "rb") as f:
+                for rows in iter_bnr_xml_arrays(f, batch_size=args.batch_size):
+                    merger.add(rows)
+                    progress.update(f.tell() - progress.n)
+                    progress.set_postfix(rows=merger.rows_read, refresh=False)
+        else:
+            # each file is merged in and written as soon as it is parsed
+            for xml_file, rows in iter_xml_arrays(xml_files, args.jobs):
+                merger.add(rows)
+                progress.update(xml_file.stat().st_size)
+                progress.set_postfix(rows=merger.rows_read, refresh=False)
+    elapsed = time.perf_counter() - start_time
 
-print("Updating database...")
+    print(
+        f"Read {merger.rows_read} items in {elapsed:.2f} s"
+        f" ({merger.rows_read / max(elapsed, 1e-9):.0f} rows/s),"
+        f" {merger.n_unique} unique, {merger.conflicts} conflicting."
+    )
+    print(f"{merger.rows_written} rows affected")
+    print("Committing...")
+    db.commit()
+    print("Done!")
 
-prev_total_changes = db.total_changes
-db.insert_many_values(map.all_rows(), replace=args.replace)
-print(f"{db.total_changes - prev_total_changes} rows affected")
-print("Committing...")
-db.commit()
-print("Done!")
 
 # %%
+if __name__ == "__main__":
+    main()